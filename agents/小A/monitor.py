@@ -7,6 +7,7 @@
 
 import sys
 sys.path.insert(0, '/home/node/clawd/agents/小A')
+sys.path.insert(0, '/home/node/clawd')
 
 import akshare as ak
 import json
@@ -16,6 +17,8 @@ import hmac
 import hashlib
 import base64
 from datetime import datetime
+from news_store import NewsStore
+from news_sentiment import format_sentiment
 
 # 钉钉配置
 WEBHOOK = "https://oapi.dingtalk.com/robot/send?access_token=d40168005a8f54cd44ee5b1286b57f6dd5a0cd6537eebe6603a3fe80339a2b0a"
@@ -63,6 +66,24 @@ def get_stock_data(symbol):
         print(f"获取{symbol}数据失败: {e}")
         return None
 
+def related_headlines(code, limit=3):
+    """信号股最近24小时的相关新闻（新闻库代码索引）"""
+    try:
+        since = int(time.time()) - 24 * 3600
+        return NewsStore().news_for_symbol(code, limit, since=since)
+    except Exception as e:
+        print(f"读取{code}相关新闻失败: {e}")
+        return []
+
+def headline_sentiment(code):
+    """信号股最近24小时新闻情绪（新闻库按代码聚合）"""
+    try:
+        since = int(time.time()) - 24 * 3600
+        return NewsStore().symbol_sentiment([code], since=since).get(code)
+    except Exception as e:
+        print(f"读取{code}新闻情绪失败: {e}")
+        return None
+
 def check_signals():
     """检查交易信号"""
     now = datetime.now()
@@ -119,8 +140,11 @@ def check_signals():
 **开盘**: ¥{open_price:.2f} ({open_change:+.2f}%)
 **最高**: ¥{high:.2f}
 **最低**: ¥{low:.2f}
----
 """
+            headlines = related_headlines(code)
+            if headlines:
+                msg += f"**相关新闻** ({format_sentiment(headline_sentiment(code))}):\n" + "".join(f"- [{n['time']}] {n['title']}\n" for n in headlines)
+            msg += "---\n"
             messages.append(msg)
     
     return messages
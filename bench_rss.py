@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+RSS 解析基准: 整篇 ET.fromstring vs 流式 iterparse
+用录制好的 feed 文件做输入，对比耗时和峰值内存
+
+用法:
+    python3 bench_rss.py --record https://feeds.bloomberg.com/markets/news.rss fixtures/bloomberg.xml
+    python3 bench_rss.py fixtures/bloomberg.xml fixtures/coindesk.xml --limit 5
+    python3 bench_rss.py --synthetic 20000      # 没有录制文件时生成一个大feed
+"""
+
+import argparse
+import io
+import os
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+import requests
+
+from finance_news import iter_rss_items
+
+
+def parse_full(data: bytes, limit: int):
+    """旧实现: 整篇解析后切片"""
+    root = ET.fromstring(data)
+    return [(item.find('title').text or '') for item in root.findall('.//item')[:limit]]
+
+
+def parse_stream(data: bytes, limit: int):
+    """新实现: 流式解析，拿够即停"""
+    results = []
+    for entry in iter_rss_items(io.BytesIO(data)):
+        results.append(entry['title'])
+        if len(results) >= limit:
+            break
+    return results
+
+
+def measure(func, data: bytes, limit: int, repeat: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(data, limit)
+    elapsed = (time.perf_counter() - start) / repeat
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed * 1000, peak / 1024
+
+
+def synthetic_feed(items: int) -> bytes:
+    body = ''.join(
+        f"<item><title>Market headline {i}</title><link>https://example.com/{i}</link>"
+        f"<pubDate>Thu, 05 Feb 2026 12:{i % 60:02d}:00 GMT</pubDate>"
+        f"<description>{'Lorem ipsum dolor sit amet. ' * 20}</description></item>"
+        for i in range(items))
+    return f'<?xml version="1.0"?><rss><channel><title>bench</title>{body}</channel></rss>'.encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='RSS 解析基准')
+    parser.add_argument('fixtures', nargs='*', help='录制的feed文件')
+    parser.add_argument('--record', nargs=2, metavar=('URL', 'PATH'), help='录制feed到文件')
+    parser.add_argument('--synthetic', type=int, default=0, help='生成N条的合成feed参与测试')
+    parser.add_argument('--limit', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.record:
+        url, path = args.record
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        resp = requests.get(url, timeout=15, headers={'User-Agent': 'Mozilla/5.0'})
+        resp.raise_for_status()
+        with open(path, 'wb') as f:
+            f.write(resp.content)
+        print(f"已录制 {url} -> {path} ({len(resp.content)} bytes)")
+        return
+
+    inputs = []
+    for path in args.fixtures:
+        with open(path, 'rb') as f:
+            inputs.append((os.path.basename(path), f.read()))
+    if args.synthetic:
+        inputs.append((f'synthetic-{args.synthetic}', synthetic_feed(args.synthetic)))
+    if not inputs:
+        parser.error('需要 feed 文件或 --synthetic N')
+
+    print(f"{'feed':<24}{'size(KB)':>10}{'full ms':>10}{'full KB':>10}{'stream ms':>11}{'stream KB':>11}")
+    for name, data in inputs:
+        full_ms, full_kb = measure(parse_full, data, args.limit, args.repeat)
+        stream_ms, stream_kb = measure(parse_stream, data, args.limit, args.repeat)
+        print(f"{name:<24}{len(data) / 1024:>10.0f}{full_ms:>10.2f}{full_kb:>10.0f}"
+              f"{stream_ms:>11.2f}{stream_kb:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
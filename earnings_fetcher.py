@@ -5,12 +5,139 @@ A股财报数据抓取器 - 修复版
 """
 
 import akshare as ak
+import numpy as np
 import pandas as pd
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
 import requests
 import json
 
+from forecast_cache import ForecastCache, NoForecastData
+
+# 个股财务指标限速: ak.stock_financial_analysis_indicator 抓的是新浪财经（不是东方财富），
+# 从 start_year 起每个年份一次请求，所以按请求数而不是按股票数取令牌
+FINANCIAL_RATE = 10         # 每秒请求数
+FINANCIAL_BURST = 10        # 突发上限
+FINANCIAL_YEARS = 2         # 关注列表只取最近两年（今年 + 去年，一季度时最新一期还是去年年报）
+WATCHLIST_WORKERS = 8
+
+# 东方财富预告类型 -> 类别（'扭亏' 属于利好、'增亏' 属于预警，不能只看字面含 增/亏）
+FORECAST_CATEGORIES = {
+    '预增': '预增', '略增': '预增', '扭亏': '预增', '续盈': '预增',
+    '预减': '预警', '略减': '预警', '首亏': '预警', '增亏': '预警', '续亏': '预警',
+}
+CATEGORY_DTYPE = pd.CategoricalDtype(['预增', '预警', '其他'])
+DERIVED_VERSION = 2  # 2: 净利润区间按 亏损 取负
+DERIVED_COLUMNS = ['类别', '摘要', '增长下限', '增长上限', '增长率', '净利润下限', '净利润上限', '扭亏']
+
+# 摘要里的 同比增长X%至Y% / 下降X% 与 X万元至Y亿元
+_GROWTH_RE = (r'(?P<dir>增长|增加|上升|提升|下降|减少|下滑|降低)(?:幅度)?(?:约|为)?\s*'
+              r'(?P<lo>-?\d+(?:\.\d+)?)\s*%(?:\s*(?:至|到|~|～|－|-)\s*(?P<hi>-?\d+(?:\.\d+)?)\s*%)?')
+# 金额前紧跟 亏损/亏 时（首亏/续亏/增亏）取负，与增幅的 下降 同理
+_PROFIT_RE = (r'(?P<loss>亏损|亏)?(?:约|为)?\s*(?:'
+              r'(?P<lo>-?\d+(?:\.\d+)?)\s*(?P<lo_unit>万元|亿元|万|亿)?\s*(?:至|到|~|～|－|-)\s*'
+              r'(?P<hi>-?\d+(?:\.\d+)?)\s*(?P<hi_unit>万元|亿元|万|亿)'
+              r'|(?P<one>-?\d+(?:\.\d+)?)\s*(?P<one_unit>万元|亿元|万|亿))')
+_UNIT_YI = {'万元': 1e-4, '万': 1e-4, '亿元': 1.0, '亿': 1.0}
+
+# 一只股票有多条预测指标（归母净利润/扣非净利润/营业收入/每股收益…），排名和扫描只用这一条
+PRIMARY_INDICATOR = '归属于上市公司股东的净利润'
+
+# 报告用的列: 输出列 -> 预告表列
+GROWTH_COLUMNS = {'code': '股票代码', 'name': '股票简称', 'type': '预告类型', 'summary': '摘要',
+                  'growth': '增长率', 'growth_low': '增长下限', 'growth_high': '增长上限',
+                  'turnaround': '扭亏'}
+UPCOMING_COLUMNS = {'code': '股票代码', 'name': '股票简称', 'scheduled_date': '公告日期', 'type': '预告类型'}
+SURPRISE_COLUMNS = {'code': '股票代码', 'name': '股票简称', 'type': '类别',
+                    'forecast_type': '预告类型', 'summary': '摘要'}
+
+
+def classify_forecasts(df: pd.DataFrame) -> pd.DataFrame:
+    """整表向量化分类，新增分类列 '类别'；预告类型转为 category 节省内存"""
+    types = df['预告类型'].fillna('').astype(str) if '预告类型' in df.columns else pd.Series('', index=df.index)
+    category = types.map(FORECAST_CATEGORIES)
+    # 非标准类型沿用关键字规则
+    category = category.mask(category.isna() & types.str.contains('增|盈'), '预增')
+    category = category.mask(category.isna() & types.str.contains('减|亏'), '预警')
+    df = df.copy()
+    df['预告类型'] = types.astype('category')
+    df['类别'] = category.fillna('其他').astype(CATEGORY_DTYPE)
+    return df
+
+
+def forecast_summary(df: pd.DataFrame) -> pd.Series:
+    """预告摘要文本: 优先 '业绩预告摘要'，东方财富表里没有时用 '业绩变动'"""
+    for col in ('业绩预告摘要', '业绩变动'):
+        if col in df.columns:
+            return df[col].fillna('').astype(str)
+    return pd.Series('', index=df.index)
+
+
+def extract_growth(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    统一摘要列 '摘要'，并从摘要向量化解析数值列:
+    增长下限/增长上限/增长率(%，区间取中值)、净利润下限/净利润上限(亿元，亏损为负)、扭亏(bool)
+    摘要里没有增幅时用 '业绩变动幅度' 兜底
+    例: '预计净利润亏损3000万元至5000万元' -> 净利润下限 -0.5, 净利润上限 -0.3
+    """
+    df = df.copy()
+    df['摘要'] = forecast_summary(df)
+    text = df['摘要'].str.replace(r'[,，]', '', regex=True)
+
+    growth = text.str.extract(_GROWTH_RE)
+    sign = growth['dir'].isin(['下降', '减少', '下滑', '降低']).map({True: -1.0, False: 1.0})
+    low = pd.to_numeric(growth['lo'], errors='coerce') * sign
+    high = pd.to_numeric(growth['hi'], errors='coerce').mul(sign).fillna(low)
+    if '业绩变动幅度' in df.columns:
+        fallback = pd.to_numeric(df['业绩变动幅度'], errors='coerce')
+        low, high = low.fillna(fallback), high.fillna(fallback)
+    df['增长下限'] = np.fmin(low, high)
+    df['增长上限'] = np.fmax(low, high)
+    df['增长率'] = (df['增长下限'] + df['增长上限']) / 2
+
+    profit = text.str.extract(_PROFIT_RE)
+    loss = profit['loss'].notna().map({True: -1.0, False: 1.0})
+    hi_unit = profit['hi_unit'].map(_UNIT_YI)
+    lo_unit = profit['lo_unit'].map(_UNIT_YI).fillna(hi_unit)
+    one = pd.to_numeric(profit['one'], errors='coerce') * profit['one_unit'].map(_UNIT_YI) * loss
+    lo = pd.to_numeric(profit['lo'], errors='coerce') * lo_unit * loss
+    hi = pd.to_numeric(profit['hi'], errors='coerce') * hi_unit * loss
+    # 亏损区间取负后上下限对调: 亏损3000万至5000万 -> -0.5 ~ -0.3 亿元
+    df['净利润下限'] = np.fmin(lo, hi).fillna(one)
+    df['净利润上限'] = np.fmax(lo, hi).fillna(one)
+
+    types = df['预告类型'].astype(str) if '预告类型' in df.columns else pd.Series('', index=df.index)
+    df['扭亏'] = (types == '扭亏') | text.str.contains('扭亏')
+    return df
+
+
+def prepare_forecast_table(df: pd.DataFrame) -> pd.DataFrame:
+    """预告表入缓存前补齐派生列"""
+    return extract_growth(classify_forecasts(df))
+
+
+def primary_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """每只股票一行: 有 '预测指标' 列时优先归母净利润那条，没有时取该股首行；保持原顺序"""
+    if df.empty or '股票代码' not in df.columns:
+        return df
+    order = df.index
+    if '预测指标' in df.columns:
+        order = (df['预测指标'].astype(str) != PRIMARY_INDICATOR).sort_values(kind='stable').index
+    keep = df.loc[order, '股票代码'].astype(str).drop_duplicates().index
+    return df[df.index.isin(keep)]
+
+
+def forecast_view(df: pd.DataFrame, columns: Dict[str, str]) -> pd.DataFrame:
+    """按 {输出列: 原列} 取列并改名，原表缺的列补空串，文本列空值补空串"""
+    view = {}
+    for out, src in columns.items():
+        col = df[src] if src in df.columns else pd.Series('', index=df.index)
+        view[out] = col.fillna('') if pd.api.types.is_string_dtype(col) else col
+    return pd.DataFrame(view).reset_index(drop=True)
+
 class FinancialReportFetcher:
     """财报数据抓取器 - 自动获取最新数据"""
     
@@ -19,68 +146,57 @@ class FinancialReportFetcher:
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
+        # 按报告期缓存的全市场预告表（含分类等派生列）
+        self.forecasts = ForecastCache(prepare=prepare_forecast_table, derived_columns=DERIVED_COLUMNS,
+                                       derived_version=DERIVED_VERSION)
     
-    def get_high_growth_stocks(self, min_growth: int = 50) -> List[Dict]:
+    @staticmethod
+    def _download_forecast(period: str) -> pd.DataFrame:
+        return ak.stock_yjyg_em(date=period)
+    
+    def load_forecast_table(self, period: str) -> pd.DataFrame:
+        """某报告期的全市场业绩预告表（本地缓存，过期或缺失时才下载）"""
+        return self.forecasts.load(period, self._download_forecast)
+    
+    def get_high_growth_stocks(self, min_growth: int = 50, limit: int = 20,
+                               df: pd.DataFrame = None) -> pd.DataFrame:
         """
         获取高增长股票（业绩预告中净利润增长较高的）
+        每只股票只看归母净利润那条预测指标，预增类且增幅中值 >= min_growth%（扭亏不看增幅），按增幅从高到低
+        df: 已载入的预告表（日报共用一份），不传时读取最新一期
+        返回 DataFrame: code, name, type, summary, growth, growth_low, growth_high, turnaround
         """
-        results = []
-        
         try:
-            df = self.get_performance_forecast()
+            if df is None:
+                df = self.get_performance_forecast()
             if df.empty:
-                return results
-            
-            # 解析增长数据
-            for _, row in df.iterrows():
-                stock_type = row.get('预告类型', '')
-                summary = row.get('业绩预告摘要', '')
-                
-                # 只关注预增类型
-                if '增' not in stock_type and '盈' not in stock_type:
-                    continue
-                
-                code = row.get('股票代码', '')
-                name = row.get('股票简称', '')
-                
-                results.append({
-                    'code': code,
-                    'name': name,
-                    'type': stock_type,
-                    'summary': summary
-                })
+                return forecast_view(df, GROWTH_COLUMNS)
             
-            # 限制返回数量
-            return results[:20]
+            df = primary_rows(df)
+            selected = df[(df['类别'] == '预增') & ((df['增长率'] >= min_growth) | df['扭亏'])]
+            ranked = selected.sort_values('增长率', ascending=False, na_position='last')
+            return forecast_view(ranked.head(limit), GROWTH_COLUMNS)
             
         except Exception as e:
             print(f"获取高增长股票失败: {e}")
-            return results
+            return forecast_view(pd.DataFrame(), GROWTH_COLUMNS)
     
-    def get_upcoming_reports(self, days: int = 7) -> List[Dict]:
+    def get_upcoming_reports(self, days: int = 7, df: pd.DataFrame = None) -> List[Dict]:
         """
         获取即将披露的财报日程
+        df: 已载入的预告表（日报共用一份），不传时读取最新一期
         """
-        results = []
-        
         try:
-            import akshare as ak
-            # 获取财报披露日程
-            df = ak.stock_yjyg_em(date=self.get_latest_report_period())
-            if not df.empty:
-                # 获取公告日期最近的
-                df_sorted = df.sort_values('公告日期', ascending=False)
-                for _, row in df_sorted.head(10).iterrows():
-                    results.append({
-                        'code': row.get('股票代码', ''),
-                        'name': row.get('股票简称', ''),
-                        'scheduled_date': row.get('公告日期', ''),
-                        'type': row.get('预告类型', '')
-                    })
+            if df is None:
+                df = self.get_performance_forecast()
+            if df.empty:
+                return []
+            # 获取公告日期最近的
+            latest = df.sort_values('公告日期', ascending=False).head(10)
+            return forecast_view(latest, UPCOMING_COLUMNS).to_dict('records')
         except Exception as e:
             print(f"获取财报日程失败: {e}")
-        
-        return results
+            return []
     
     def get_latest_report_period(self) -> str:
         """
@@ -106,9 +222,21 @@ class FinancialReportFetcher:
         else:               # 1-3月：上年年报
             return f"{year-1}1231"
     
+    @staticmethod
+    def previous_period(period: str) -> str:
+        """上一个报告期"""
+        if '1231' in period:
+            return period.replace('1231', '0930')
+        elif '0930' in period:
+            return period.replace('0930', '0630')
+        elif '0630' in period:
+            return period.replace('0630', '0331')
+        return str(int(period[:4])-1) + '1231'
+    
     def get_performance_forecast(self, date: str = None) -> pd.DataFrame:
         """
         获取业绩预告 - 自动获取最新
+        当前期和上一期并发探测，返回最近一期有数据的表
         """
         if date is None:
             date = self.get_latest_report_period()
@@ -116,39 +244,30 @@ class FinancialReportFetcher:
         print(f"正在获取 {date} 期业绩预告...")
         
         try:
-            df = ak.stock_yjyg_em(date=date)
-            print(f"✅ 获取成功，共 {len(df)} 条")
-            return df
-        except Exception as e:
+            period, df = self.forecasts.load_first([date, self.previous_period(date)],
+                                                   self._download_forecast)
+        except NoForecastData as e:
             print(f"❌ 获取失败: {e}")
-            # 尝试上一个季度
-            if '1231' in date:
-                fallback = date.replace('1231', '0930')
-            elif '0930' in date:
-                fallback = date.replace('0930', '0630')
-            elif '0630' in date:
-                fallback = date.replace('0630', '0331')
-            else:
-                fallback = str(int(date[:4])-1) + '1231'
-            
-            print(f"尝试获取上一期 {fallback}...")
-            try:
-                df = ak.stock_yjyg_em(date=fallback)
-                print(f"✅ 获取成功，共 {len(df)} 条")
-                return df
-            except Exception as e2:
-                print(f"❌ 也失败: {e2}")
-                return pd.DataFrame()
+            return pd.DataFrame()
+        
+        if period != date:
+            print(f"{date} 期暂无数据，使用上一期 {period}")
+        print(f"✅ 获取成功，共 {len(df)} 条")
+        return df
     
-    def get_stock_financial(self, symbol: str) -> Dict:
+    def get_stock_financial(self, symbol: str, start_year: Optional[int] = None) -> Dict:
         """
         获取个股最新财务指标
+        start_year: 从哪一年开始取（每年一次请求），不传时取全部历史
         """
         result = {'symbol': symbol, 'timestamp': datetime.now().isoformat()}
         
         # 方法1: 主要财务指标
         try:
-            df = ak.stock_financial_analysis_indicator(symbol=symbol)
+            if start_year is None:
+                df = ak.stock_financial_analysis_indicator(symbol=symbol)
+            else:
+                df = ak.stock_financial_analysis_indicator(symbol=symbol, start_year=str(start_year))
             if not df.empty:
                 latest = df.iloc[0]
                 result['latest_period'] = str(latest.get('报告期', 'N/A'))
@@ -168,11 +287,8 @@ class FinancialReportFetcher:
         
         return result
     
-    def get_stock_earnings_forecast(self, symbol: str) -> Dict:
-        """
-        获取个股业绩预告（如有）
-        """
-        # 尝试最新几个报告期
+    def candidate_periods(self, limit: int = 4) -> List[str]:
+        """可能有业绩预告的报告期，从新到旧"""
         periods = [
             self.get_latest_report_period(),
         ]
@@ -184,24 +300,48 @@ class FinancialReportFetcher:
                 p = f"{year}{q}"
                 if p not in periods:
                     periods.append(p)
-        
-        for period in periods[:4]:  # 最多试4个
-            try:
-                df = ak.stock_yjyg_em(date=period)
-                stock_data = df[df['股票代码'] == symbol]
-                if not stock_data.empty:
-                    row = stock_data.iloc[0]
-                    return {
-                        'period': period,
-                        'type': row.get('预告类型', 'N/A'),
-                        'date': row.get('公告日期', 'N/A'),
-                        'summary': row.get('业绩预告摘要', '')[:200] if row.get('业绩预告摘要') else '',
-                        'found': True
-                    }
-            except:
+        return periods[:limit]
+    
+    @staticmethod
+    def _forecast_record(row: Dict, period: str) -> Dict:
+        summary = row.get('摘要', '')
+        return {
+            'period': period,
+            'type': row.get('预告类型', 'N/A'),
+            'date': row.get('公告日期', 'N/A'),
+            'summary': summary[:200] if isinstance(summary, str) else '',
+            'found': True
+        }
+    
+    def get_earnings_forecasts(self, symbols: List[str]) -> Dict[str, Dict]:
+        """
+        批量查询业绩预告: {代码: 预告}，每个代码取最近一期有预告的报告期
+        每期只按代码索引定位行号，整批一次取行，不再逐只全表扫描
+        """
+        results = {}
+        pending = list(dict.fromkeys(symbols))
+        # 候选报告期并发载入（已缓存的直接命中），再从新到旧逐期定位
+        periods = self.candidate_periods()
+        tables = self.forecasts.probe(periods, self._download_forecast)
+        for period in periods:
+            if not pending:
+                break
+            if period not in tables:
                 continue
+            rows = self.forecasts.gather(period, pending)
+            for code, row in zip(rows['股票代码'].astype(str), rows.to_dict('records')):
+                results[code] = self._forecast_record(row, period)
+            pending = [c for c in pending if c not in results]
         
-        return {'found': False, 'period': None}
+        for code in pending:
+            results[code] = {'found': False, 'period': None}
+        return results
+    
+    def get_stock_earnings_forecast(self, symbol: str) -> Dict:
+        """
+        获取个股业绩预告（如有）
+        """
+        return self.get_earnings_forecasts([symbol])[symbol]
     
     def search_stock_financial(self, symbol: str) -> Dict:
         """
@@ -275,72 +415,108 @@ def analyze_stock_report(symbol: str, name: str = None) -> str:
     return "\n".join(report)
 
 
+class TokenBucket:
+    """令牌桶限速（线程安全）: 每秒补充 rate 个令牌，最多积攒 burst 个"""
+    
+    def __init__(self, rate: float = FINANCIAL_RATE, burst: int = FINANCIAL_BURST):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self, tokens: int = 1):
+        """取 tokens 个令牌（不超过 burst），不够时等待"""
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
 class EarningsMonitor:
     """财报监控器 - 扫描业绩异动"""
     
-    def __init__(self):
-        self.fetcher = FinancialReportFetcher()
+    def __init__(self, fetcher: FinancialReportFetcher = None):
+        self.fetcher = fetcher or FinancialReportFetcher()
     
-    def scan_surprises(self) -> List[Dict]:
+    def scan_surprises(self, df: pd.DataFrame = None) -> pd.DataFrame:
         """
-        扫描业绩超预期/预警股票
+        扫描业绩超预期/预警股票（每只股票一行，见 primary_rows）
+        df: 已载入的预告表（日报共用一份），不传时读取最新一期
+        返回 DataFrame: code, name, type(预增/预警/其他), forecast_type, summary
         """
-        results = []
-        
         try:
             # 获取最新业绩预告
-            df = self.fetcher.get_performance_forecast()
-            if df.empty:
-                return results
-            
-            for _, row in df.iterrows():
-                stock_type = row.get('预告类型', '')
-                code = row.get('股票代码', '')
-                name = row.get('股票简称', '')
-                
-                # 分类
-                if '增' in stock_type or '盈' in stock_type:
-                    stype = '预增'
-                elif '减' in stock_type or '亏' in stock_type:
-                    stype = '预警'
-                else:
-                    stype = '其他'
-                
-                results.append({
-                    'code': code,
-                    'name': name,
-                    'type': stype,
-                    'forecast_type': stock_type,
-                    'summary': row.get('业绩预告摘要', '')
-                })
+            if df is None:
+                df = self.fetcher.get_performance_forecast()
+            if not df.empty:
+                return forecast_view(primary_rows(df), SURPRISE_COLUMNS)
         except Exception as e:
             print(f"扫描失败: {e}")
         
-        return results
+        return forecast_view(pd.DataFrame(), SURPRISE_COLUMNS)
     
-    def get_watchlist_earnings(self, watchlist: List[str]) -> List[Dict]:
+    def _fetch_financial(self, symbol: str, bucket: TokenBucket) -> Dict:
+        # 只用最新一期，历史不必全取；一年一次请求，按年份数取令牌
+        start_year = datetime.now().year - FINANCIAL_YEARS + 1
+        bucket.acquire(FINANCIAL_YEARS)
+        financial = self.fetcher.get_stock_financial(symbol, start_year=start_year)
+        if 'indicators_error' in financial:
+            raise RuntimeError(financial['indicators_error'])
+        return financial.get('indicators', {})
+    
+    def get_watchlist_earnings(self, watchlist: List[str], include_financial: bool = True,
+                               workers: int = WATCHLIST_WORKERS, rate: float = FINANCIAL_RATE,
+                               progress: Optional[Callable[[int, int, str], None]] = None) -> List[Dict]:
         """
         获取关注列表的财报信息
+        业绩预告从缓存的全市场表批量定位；财务指标逐只请求最近两年，有界线程池 + 按请求数的令牌桶限速
+        progress(已完成数, 总数, 代码) 每完成一只调用一次
+        返回每只一条: {'code', 'forecast', 'financial', 'error'}，单只失败只记在 'error'
         """
-        results = []
-        for symbol in watchlist:
-            try:
-                forecast = self.fetcher.get_stock_earnings_forecast(symbol)
-                if forecast.get('found'):
-                    results.append({
-                        'code': symbol,
-                        'forecast': forecast
-                    })
-            except:
-                continue
-    def check_watchlist(self, watchlist: List[str]) -> Dict:
+        symbols = list(dict.fromkeys(watchlist))
+        forecasts = self.fetcher.get_earnings_forecasts(symbols)
+        results = {code: {'code': code, 'forecast': forecasts[code], 'financial': {}, 'error': None}
+                   for code in symbols}
+        if not include_financial:
+            return list(results.values())
+        
+        bucket = TokenBucket(rate, FINANCIAL_BURST)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(self._fetch_financial, code, bucket): code for code in symbols}
+            for done, future in enumerate(as_completed(futures), 1):
+                code = futures[future]
+                try:
+                    results[code]['financial'] = future.result()
+                except Exception as e:
+                    results[code]['error'] = str(e)
+                if progress:
+                    progress(done, len(symbols), code)
+        return list(results.values())
+    
+    def check_watchlist(self, watchlist: List[str],
+                        progress: Optional[Callable[[int, int, str], None]] = None) -> Dict:
         """
         检查关注列表的财报情况
+        返回 {'checked', 'reports': 每只结果, 'with_earnings': 有业绩预告的, 'errors': 失败的}
         """
+        reports = self.get_watchlist_earnings(watchlist, progress=progress)
         return {
             'checked': len(watchlist),
-            'with_earnings': self.get_watchlist_earnings(watchlist)
+            'reports': reports,
+            'with_earnings': [r for r in reports if r['forecast'].get('found')],
+            'errors': [r for r in reports if r['error']],
         }
+
+
+if __name__ == "__main__":
     import sys
     
     if len(sys.argv) > 1:
@@ -9,18 +9,35 @@ sys.path.insert(0, '/home/node/clawd')
 
 from earnings_fetcher import FinancialReportFetcher, EarningsMonitor
 from datetime import datetime
+import time
+
+import pandas as pd
 
 class EarningsReporter:
     """财报报告生成器"""
     
     def __init__(self):
         self.fetcher = FinancialReportFetcher()
-        self.monitor = EarningsMonitor()
+        self.monitor = EarningsMonitor(self.fetcher)  # 共用同一份预告表缓存
+        self.last_timing = {}  # 最近一次日报各阶段耗时（秒）
     
     def generate_daily_scan(self) -> str:
         """
         每日财报扫描报告
+        预告表只载入一次，各板块都从同一个内存表派生；各阶段耗时记在 last_timing
         """
+        timing = {}
+        started = time.perf_counter()
+        
+        def lap(stage: str):
+            nonlocal started
+            now = time.perf_counter()
+            timing[stage] = round(now - started, 3)
+            started = now
+        
+        forecast = self.fetcher.get_performance_forecast()
+        lap('载入预告表')
+        
         report = []
         report.append("=" * 60)
         report.append(f"📊 TradeGod 财报日报 ({datetime.now().strftime('%Y-%m-%d')})")
@@ -30,39 +47,55 @@ class EarningsReporter:
         report.append("\n🚀 【业绩预增】高增长股票")
         report.append("-" * 50)
         
-        growth = self.fetcher.get_high_growth_stocks(min_growth=50)
-        for i, stock in enumerate(growth[:10], 1):
-            report.append(f"{i}. {stock['code']} {stock['name']} [{stock['type']}]")
+        growth = self.fetcher.get_high_growth_stocks(min_growth=50, df=forecast)
+        for i, stock in enumerate(growth.head(10).to_dict('records'), 1):
+            growth_note = "扭亏" if pd.isna(stock['growth']) else f"{stock['growth_low']:+.0f}%~{stock['growth_high']:+.0f}%"
+            report.append(f"{i}. {stock['code']} {stock['name']} [{stock['type']}] {growth_note}")
             if stock['summary']:
                 report.append(f"   {stock['summary'][:60]}...")
         
+        lap('业绩预增')
+        
         # 2. 业绩预警
         report.append("\n⚠️ 【业绩预警】需关注股票")
         report.append("-" * 50)
         
-        surprises = self.monitor.scan_surprises()
-        warnings = [s for s in surprises if s['type'] == '预警']
-        for i, stock in enumerate(warnings[:5], 1):
+        surprises = self.monitor.scan_surprises(df=forecast)
+        warnings = surprises[surprises['type'] == '预警']
+        for i, stock in enumerate(warnings.head(5).to_dict('records'), 1):
             report.append(f"{i}. {stock['code']} {stock['name']}")
         
+        lap('业绩预警')
+        
         # 3. 即将披露
         report.append("\n📅 【即将披露】财报日历")
         report.append("-" * 50)
         
-        upcoming = self.fetcher.get_upcoming_reports(days=7)
+        upcoming = self.fetcher.get_upcoming_reports(days=7, df=forecast)
         for stock in upcoming[:10]:
             report.append(f"  • {stock['code']} {stock['name']} - {stock['scheduled_date']}")
         
+        lap('即将披露')
+        
         # 4. 关注列表检查
         watchlist = ['000001', '600519', '688256']  # 平安银行、茅台、寒武纪
         report.append("\n👀 【关注列表】财报追踪")
         report.append("-" * 50)
         
         watch_results = self.monitor.check_watchlist(watchlist)
-        for r in watch_results.get('reports', []):
-            report.append(f"  • {r['symbol']}: 营收 {r['data'].get('营业收入', 'N/A')}亿, ROE {r['data'].get('ROE', 'N/A')}%")
+        for r in watch_results['reports']:
+            if r['error']:
+                report.append(f"  • {r['code']}: 财务数据获取失败 ({r['error'][:40]})")
+            else:
+                report.append(f"  • {r['code']}: 营收 {r['financial'].get('营业收入', 'N/A')}亿, ROE {r['financial'].get('ROE', 'N/A')}%")
+            if r['forecast'].get('found'):
+                report.append(f"    预告({r['forecast']['period']}): {r['forecast']['type']}")
+        
+        lap('关注列表')
         
+        self.last_timing = timing
         report.append("\n" + "=" * 60)
+        report.append("⏱ 耗时: " + " | ".join(f"{k} {v:.2f}s" for k, v in timing.items()))
         
         return "\n".join(report)
 
@@ -5,10 +5,55 @@
 备用源：Bloomberg(英文)、CoinDesk(加密)
 """
 
+import time
 import requests
 import xml.etree.ElementTree as ET
 from datetime import datetime
-from typing import List, Dict
+from email.utils import parsedate_to_datetime
+from typing import Iterator, List, Dict
+
+from news_concurrent import DEFAULT_DEADLINE
+from sina_roll import SINA_TTL, WatermarkStore, fetch_sina_page, refresh_sina
+from news_store import NewsStore
+from http_cache import HttpCache
+from news_index import NewsIndex
+from news_timeline import NewsTimeline
+from keyword_tagger import get_tagger
+
+RSS_TTL = 300  # 英文RSS的HTTP缓存新鲜期（秒）
+
+
+def iter_rss_items(source) -> Iterator[Dict]:
+    """
+    流式解析RSS（iterparse），逐条产出 <item> 的 title/link/pubDate/description
+    每条处理完立即清理，内存占用与feed大小无关；调用方停止迭代即停止读取
+    'ctime' 为 pubDate 解析出的epoch，解析失败为 0
+    """
+    channel = None
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        tag = elem.tag.rsplit('}', 1)[-1]
+        if event == 'start':
+            if tag == 'channel':
+                channel = elem
+            continue
+        if tag != 'item':
+            continue
+        
+        entry = {field: '' for field in ('title', 'link', 'pubDate', 'description')}
+        for child in elem:
+            name = child.tag.rsplit('}', 1)[-1]
+            if name in entry:
+                entry[name] = (child.text or '').strip()
+        try:
+            entry['ctime'] = int(parsedate_to_datetime(entry['pubDate']).timestamp())
+        except (TypeError, ValueError):
+            entry['ctime'] = 0
+        
+        elem.clear()
+        if channel is not None:
+            channel.clear()
+        yield entry
+
 
 class FinanceNewsFetcher:
     """财经新闻抓取器"""
@@ -18,150 +63,146 @@ class FinanceNewsFetcher:
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
         })
+        self.last_timing = {}  # 最近一次并发抓取的各源耗时
+        self.watermarks = WatermarkStore()
+        self.http_cache = HttpCache()
+        self.store = NewsStore()
+        self.index = NewsIndex.from_store(self.store, tagger=get_tagger())
+        self.store.subscribe(self.index.add)
+        self.timeline = NewsTimeline.from_store(self.store)
+        self.store.subscribe(self.timeline.add)
     
     # ==================== 中文A股（主力）====================
     
-    def get_sina_finance(self, limit: int = 20) -> List[Dict]:
+    def get_sina_finance(self, limit: int = 20, page: int = 1) -> List[Dict]:
         """新浪财经-财经新闻 - 最稳定实时"""
-        url = "https://feed.mix.sina.com.cn/api/roll/get"
-        params = {"pageid": "153", "lid": "2516", "num": limit, "page": "1", "encode": "utf-8"}
-        
         try:
-            resp = self.session.get(url, params=params, timeout=10)
-            data = resp.json()
-            results = []
-            for item in data.get('result', {}).get('data', []):
-                ctime = int(item.get('ctime', 0))
-                dt = datetime.fromtimestamp(ctime) if ctime else datetime.now()
-                results.append({
-                    'title': item.get('title', ''),
-                    'summary': item.get('intro', '')[:150],
-                    'url': item.get('wapurl', ''),
-                    'time': dt.strftime('%m-%d %H:%M'),
-                    'full_time': dt.strftime('%Y-%m-%d %H:%M:%S'),
-                    'source': '新浪财经',
-                    'type': 'a_stock'
-                })
-            return results
+            return fetch_sina_page(self.session, '新浪财经', num=limit, page=page, cache=self.http_cache)
         except Exception as e:
             print(f"[错误] 新浪财经: {e}")
             return []
     
-    def get_sina_stock(self, limit: int = 10) -> List[Dict]:
+    def get_sina_stock(self, limit: int = 10, page: int = 1) -> List[Dict]:
         """新浪财经-股票新闻"""
-        url = "https://feed.mix.sina.com.cn/api/roll/get"
-        params = {"pageid": "153", "lid": "2517", "num": limit, "page": "1", "encode": "utf-8"}
-        
         try:
-            resp = self.session.get(url, params=params, timeout=10)
-            data = resp.json()
-            results = []
-            for item in data.get('result', {}).get('data', []):
-                ctime = int(item.get('ctime', 0))
-                dt = datetime.fromtimestamp(ctime) if ctime else datetime.now()
-                results.append({
-                    'title': item.get('title', ''),
-                    'summary': item.get('intro', '')[:150],
-                    'url': item.get('wapurl', ''),
-                    'time': dt.strftime('%m-%d %H:%M'),
-                    'full_time': dt.strftime('%Y-%m-%d %H:%M:%S'),
-                    'source': '新浪股票',
-                    'type': 'a_stock'
-                })
-            return results
+            return fetch_sina_page(self.session, '新浪股票', num=limit, page=page, cache=self.http_cache)
         except Exception as e:
             print(f"[错误] 新浪股票: {e}")
             return []
     
     # ==================== 英文/加密（备用）====================
     
-    def get_bloomberg(self, limit: int = 5) -> List[Dict]:
+    def _get_rss(self, url: str, limit: int, only_new: bool = False) -> List[Dict]:
+        """
+        抓取RSS（走HTTP缓存，TTL内和304时不重新下载），从磁盘流式解析，拿够 limit 条即停
+        only_new: 遇到新闻库里已有的条目即停止（RSS按时间倒序）
+        """
+        resp = self.http_cache.get(self.session, url, ttl=RSS_TTL, timeout=8)
+        results = []
+        with resp.open() as f:
+            for entry in iter_rss_items(f):
+                if only_new and self.store.contains({'url': entry['link'], 'title': entry['title']}):
+                    break
+                results.append(entry)
+                if len(results) >= limit:
+                    break
+        return results
+    
+    def get_bloomberg(self, limit: int = 5, only_new: bool = False) -> List[Dict]:
         """Bloomberg Markets - 需翻墙"""
         url = "https://feeds.bloomberg.com/markets/news.rss"
         
         try:
-            resp = self.session.get(url, timeout=8)
-            root = ET.fromstring(resp.content)
-            results = []
-            
-            for item in root.findall('.//item')[:limit]:
-                title = item.find('title').text or ''
-                link = item.find('link').text or ''
-                pub = item.find('pubDate').text or ''
-                
-                results.append({
-                    'title': title.replace('<![CDATA[', '').replace(']]>', ''),
-                    'summary': '',
-                    'url': link,
-                    'time': pub[:17] if pub else '',
-                    'source': 'Bloomberg',
-                    'type': 'global'
-                })
-            return results
+            return [{
+                'title': entry['title'].replace('<![CDATA[', '').replace(']]>', ''),
+                'summary': '',
+                'url': entry['link'],
+                'ctime': entry['ctime'],
+                'time': entry['pubDate'][:17],
+                'source': 'Bloomberg',
+                'type': 'global'
+            } for entry in self._get_rss(url, limit, only_new)]
         except Exception as e:
             return []
     
-    def get_coindesk(self, limit: int = 5) -> List[Dict]:
+    def get_coindesk(self, limit: int = 5, only_new: bool = False) -> List[Dict]:
         """CoinDesk - 加密货币"""
         url = "https://www.coindesk.com/arc/outboundfeeds/rss/"
         
         try:
-            resp = self.session.get(url, timeout=8)
-            root = ET.fromstring(resp.content)
-            results = []
-            
-            for item in root.findall('.//item')[:limit]:
-                title = item.find('title').text or ''
-                link = item.find('link').text or ''
-                pub = item.find('pubDate').text or ''
-                desc = item.find('description').text or ''
-                
-                results.append({
-                    'title': title,
-                    'summary': desc[:100] if desc else '',
-                    'url': link,
-                    'time': pub[:17] if pub else '',
-                    'source': 'CoinDesk',
-                    'type': 'crypto'
-                })
-            return results
+            return [{
+                'title': entry['title'],
+                'summary': entry['description'][:100],
+                'url': entry['link'],
+                'ctime': entry['ctime'],
+                'time': entry['pubDate'][:17],
+                'source': 'CoinDesk',
+                'type': 'crypto'
+            } for entry in self._get_rss(url, limit, only_new)]
         except Exception as e:
             return []
     
     # ==================== 统一接口 ====================
     
-    def fetch_a_stock(self, limit: int = 20) -> List[Dict]:
+    def _refresh(self, page_size: int, deadline: float, ttl: float = SINA_TTL,
+                 extra_tasks: Dict = None) -> List[Dict]:
+        """增量刷新新浪各源（可附带其它源）并写入新闻库，返回库中真正新增的条目"""
+        _, added, self.last_timing = refresh_sina(self.session, self.watermarks, self.store, page_size,
+                                                  deadline, cache=self.http_cache, ttl=ttl,
+                                                  extra_tasks=extra_tasks)
+        return added
+    
+    def poll_a_stock(self, page_size: int = 20, deadline: float = DEFAULT_DEADLINE,
+                     ttl: float = SINA_TTL) -> List[Dict]:
+        """
+        增量抓取A股新闻：只返回上次之后新出现的条目
+        各源按 ctime 高水位翻页，遇到已见过的新闻即停，水位持久化到磁盘
+        结果写入新闻库，两个频道重复的新闻只返回一次
+        ttl: HTTP缓存新鲜期，高频轮询时传 0
+        """
+        return self._refresh(page_size, deadline, ttl)
+    
+    def fetch_a_stock(self, limit: int = 20, deadline: float = DEFAULT_DEADLINE) -> List[Dict]:
         """
         只抓取A股新闻（最常用）
+        先增量刷新新闻库，再从库中读取最新 limit 条（已去重）
         """
-        finance = self.get_sina_finance(limit)
-        stock = self.get_sina_stock(limit // 2)
-        return finance + stock
+        self.poll_a_stock(page_size=max(limit, 20), deadline=deadline)
+        return self.store.recent(limit, news_type='a_stock')
     
-    def fetch_all(self, include_global: bool = False) -> Dict:
+    def fetch_all(self, include_global: bool = False, deadline: float = DEFAULT_DEADLINE) -> Dict:
         """
-        抓取全部新闻
+        抓取全部新闻（所有源并发，共享截止时间）
         include_global: 是否包含英文源（较慢）
+        各源写入新闻库后统一从库读取；超时的源沿用库中已有数据，各源耗时见 'timing'
         """
-        a_stock = self.fetch_a_stock(15)
+        tasks = {}
+        if include_global:
+            tasks['Bloomberg'] = lambda: self.get_bloomberg(5, only_new=True)
+            tasks['CoinDesk'] = lambda: self.get_coindesk(5, only_new=True)
+        
+        self._refresh(20, deadline, extra_tasks=tasks)
         
         result = {
-            'a_stock': a_stock,
+            'a_stock': self.store.recent(22, news_type='a_stock'),
             'fetch_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'timing': self.last_timing,
         }
         
         if include_global:
-            result['global'] = self.get_bloomberg(5)
-            result['crypto'] = self.get_coindesk(5)
+            result['global'] = self.store.recent(5, source='Bloomberg')
+            result['crypto'] = self.store.recent(5, source='CoinDesk')
         
         return result
     
     def search(self, keyword: str, news_list: List[Dict] = None) -> List[Dict]:
         """
         关键词搜索
+        不传 news_list 时刷新新闻库后走倒排索引；传入列表则在该列表内逐条匹配
         """
         if news_list is None:
-            news_list = self.fetch_a_stock(30)
+            self.poll_a_stock()
+            return self.index.search(keyword, limit=30)
         
         keyword_lower = keyword.lower()
         results = []
@@ -173,22 +214,21 @@ class FinanceNewsFetcher:
         
         return results
     
-    def filter_by_time(self, news_list: List[Dict], hours: int = 1) -> List[Dict]:
+    def filter_by_time(self, news_list: List[Dict] = None, hours: int = 1) -> List[Dict]:
         """
         筛选最近N小时的新闻
+        不传 news_list 时在时间线上二分切片；传入列表则比较入库时解析好的 ctime，
+        没有有效发布时间的新闻不再默认保留
         """
-        now = datetime.now()
-        results = []
-        
-        for news in news_list:
-            try:
-                news_time = datetime.strptime(news.get('full_time', ''), '%Y-%m-%d %H:%M:%S')
-                if (now - news_time) <= timedelta(hours=hours):
-                    results.append(news)
-            except:
-                # 如果解析失败，默认保留
-                results.append(news)
+        if news_list is None:
+            self.poll_a_stock()
+            return self.timeline.last_hours(hours)
         
+        since = time.time() - hours * 3600
+        results = [news for news in news_list if news.get('ctime') and news['ctime'] >= since]
+        dropped = sum(1 for news in news_list if not news.get('ctime'))
+        if dropped:
+            print(f"[警告] {dropped} 条新闻缺少发布时间，已忽略")
         return results
 
 
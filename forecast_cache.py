@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+业绩预告全市场表的按报告期本地缓存
+- ak.stock_yjyg_em 每次都下载整个市场的预告表，这里每个报告期只下载一次
+- 已结束披露的报告期不再变化，永久使用本地文件；当前报告期每 N 小时刷新
+- 有 pyarrow 时存 Parquet，否则退回 pickle
+- 每个载入的报告期建一次 股票代码 -> 行号 索引，批量查询 O(1) 定位后一次性取行
+- 下载后先经 prepare 补齐派生列（分类等）再落盘，派生列和原表一起缓存；派生算法升版本后旧缓存读出即重算
+- 多个候选报告期并发探测；"暂无数据" 也缓存（有效期短），避免反复空跑
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    CACHE_FORMAT = 'parquet'
+except ImportError:
+    CACHE_FORMAT = 'pickle'
+
+FORECAST_CACHE_DIR = '/home/node/clawd/.forecast_cache'
+REFRESH_HOURS = 6           # 当前报告期刷新间隔
+DISCLOSURE_WINDOW = 122     # 报告期结束后约4个月内仍有预告发布（年报预告截至次年4月底）
+MISSING_TTL = 15 * 60       # "暂无数据" 的缓存有效期（秒）
+PROBE_WORKERS = 4
+VERSION_COLUMN = '_派生版本'  # 缓存表里派生列的算法版本，低于当前版本时读出后重算
+
+
+class NoForecastData(LookupError):
+    """该报告期暂无预告数据（或下载失败且无本地缓存）"""
+
+
+def period_closed(period: str, now: Optional[datetime] = None) -> bool:
+    """报告期的预告披露是否已结束（之后表不再变化）"""
+    now = now or datetime.now()
+    return now > datetime.strptime(period, '%Y%m%d') + timedelta(days=DISCLOSURE_WINDOW)
+
+
+class ForecastCache:
+    """按报告期缓存的业绩预告表（内存 + 磁盘两级）"""
+
+    def __init__(self, cache_dir: str = FORECAST_CACHE_DIR, refresh_hours: float = REFRESH_HOURS,
+                 prepare: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+                 derived_columns: Optional[List[str]] = None, derived_version: int = 1):
+        self.cache_dir = cache_dir
+        self.prepare = prepare
+        self.derived_columns = derived_columns or []  # 旧缓存缺这些列时重新 prepare
+        self.derived_version = derived_version  # 派生算法改动时调高，旧缓存读出后重新 prepare
+        self.refresh_seconds = refresh_hours * 3600
+        self.tables: Dict[str, pd.DataFrame] = {}
+        self.loaded_at: Dict[str, float] = {}
+        self.row_index: Dict[str, Dict[str, int]] = {}  # 报告期 -> {股票代码: 首行行号}
+        self.missing: Dict[str, float] = {}  # 报告期 -> 确认无数据的时间
+        self.stats = {'memory': 0, 'disk': 0, 'download': 0, 'missing': 0}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, period: str) -> str:
+        ext = 'parquet' if CACHE_FORMAT == 'parquet' else 'pkl'
+        return os.path.join(self.cache_dir, f"yjyg_{period}.{ext}")
+
+    def _missing_path(self, period: str) -> str:
+        return os.path.join(self.cache_dir, f"yjyg_{period}.missing")
+
+    def _known_missing(self, period: str) -> bool:
+        """短期内确认过无数据（内存或磁盘标记，多个进程共享）"""
+        marked = self.missing.get(period)
+        if marked is None and os.path.exists(self._missing_path(period)):
+            marked = os.path.getmtime(self._missing_path(period))
+        return marked is not None and time.time() - marked < MISSING_TTL
+
+    def _mark_missing(self, period: str):
+        self.missing[period] = time.time()
+        with open(self._missing_path(period), 'w'):
+            pass
+
+    def _fresh(self, period: str, mtime: float) -> bool:
+        return period_closed(period) or time.time() - mtime < self.refresh_seconds
+
+    def _read(self, path: str) -> pd.DataFrame:
+        if CACHE_FORMAT == 'parquet':
+            return pd.read_parquet(path)
+        return pd.read_pickle(path)
+
+    def _write(self, df: pd.DataFrame, path: str):
+        tmp = f"{path}.tmp"
+        if CACHE_FORMAT == 'parquet':
+            df.to_parquet(tmp, index=False)
+        else:
+            df.to_pickle(tmp)
+        os.replace(tmp, path)
+
+    def _prepare(self, df: pd.DataFrame) -> pd.DataFrame:
+        df = self.prepare(df)
+        df[VERSION_COLUMN] = self.derived_version
+        return df
+
+    def _outdated(self, df: pd.DataFrame) -> bool:
+        if not set(self.derived_columns) <= set(df.columns) or VERSION_COLUMN not in df.columns:
+            return True
+        return bool(len(df)) and int(df[VERSION_COLUMN].iloc[0]) < self.derived_version
+
+    def _read_prepared(self, path: str) -> pd.DataFrame:
+        """读本地表；旧版缓存缺派生列或版本过低时补算并回写（保留原修改时间，不影响刷新判断）"""
+        df = self._read(path)
+        if self.prepare is not None and self._outdated(df):
+            mtime = os.path.getmtime(path)
+            df = self._prepare(df)
+            self._write(df, path)
+            os.utime(path, (mtime, mtime))
+        return df
+
+    def load(self, period: str, fetch: Callable[[str], pd.DataFrame]) -> pd.DataFrame:
+        """
+        某报告期的全市场预告表
+        fetch(period) 负责下载；下载失败时用过期的本地文件兜底，
+        没有本地文件时记为 "暂无数据" 并抛出 NoForecastData
+        """
+        with self._lock:
+            if period in self.tables and self._fresh(period, self.loaded_at[period]):
+                self.stats['memory'] += 1
+                return self.tables[period]
+
+        path = self._path(period)
+        if os.path.exists(path) and self._fresh(period, os.path.getmtime(path)):
+            df = self._read_prepared(path)
+            self.stats['disk'] += 1
+            loaded_at = os.path.getmtime(path)
+        elif not os.path.exists(path) and self._known_missing(period):
+            self.stats['missing'] += 1
+            raise NoForecastData(f"{period} 期暂无业绩预告")
+        else:
+            try:
+                df = fetch(period)
+                if df is None or df.empty:
+                    raise NoForecastData(f"{period} 期暂无业绩预告")
+            except Exception as e:
+                if not os.path.exists(path):
+                    self._mark_missing(period)
+                    raise e if isinstance(e, NoForecastData) else NoForecastData(f"{period} 期: {e}")
+                print(f"[警告] {period} 期预告下载失败，使用本地缓存")
+                df = self._read_prepared(path)
+            else:
+                if self.prepare is not None:
+                    df = self._prepare(df)
+                self._write(df, path)
+                self.missing.pop(period, None)
+                if os.path.exists(self._missing_path(period)):
+                    os.remove(self._missing_path(period))
+                self.stats['download'] += 1
+            loaded_at = time.time()
+
+        index = build_row_index(df)
+        with self._lock:
+            self.tables[period] = df
+            self.loaded_at[period] = loaded_at
+            self.row_index[period] = index
+        return df
+
+    def probe(self, periods: List[str], fetch: Callable[[str], pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+        """并发载入多个报告期，返回有数据的 {报告期: 表}；冷启动只花一次往返的时间"""
+        def attempt(period):
+            try:
+                return self.load(period, fetch)
+            except NoForecastData:
+                return None
+
+        with ThreadPoolExecutor(max_workers=min(PROBE_WORKERS, len(periods)) or 1) as pool:
+            tables = dict(zip(periods, pool.map(attempt, periods)))
+        return {p: df for p, df in tables.items() if df is not None}
+
+    def load_first(self, periods: List[str], fetch: Callable[[str], pd.DataFrame]) -> Tuple[str, pd.DataFrame]:
+        """按给定顺序（从新到旧）返回第一个有数据的报告期，都没有时抛出 NoForecastData"""
+        tables = self.probe(periods, fetch)
+        for period in periods:
+            if period in tables:
+                return period, tables[period]
+        raise NoForecastData(f"{', '.join(periods)} 均无业绩预告")
+
+    def gather(self, period: str, codes: Iterable[str]) -> pd.DataFrame:
+        """已载入报告期中这些代码的行（每个代码取首行，表中没有的忽略），一次 iloc 取出"""
+        index = self.row_index.get(period, {})
+        positions = [index[c] for c in codes if c in index]
+        return self.tables[period].iloc[positions]
+
+
+def build_row_index(df: pd.DataFrame) -> Dict[str, int]:
+    """股票代码 -> 首次出现的行号（同一股票多条预测指标时与原 iloc[0] 一致）"""
+    if df.empty or '股票代码' not in df.columns:
+        return {}
+    codes = df['股票代码'].astype(str)
+    first = ~codes.duplicated()
+    return dict(zip(codes[first], first.to_numpy().nonzero()[0].tolist()))
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+新闻源 HTTP 磁盘缓存
+- TTL 内直接用磁盘上的响应体，不发请求（同一次报告、相邻的 cron 任务共享）
+- 过期后带 If-None-Match / If-Modified-Since 做条件请求，304 时沿用缓存并续期
+- 响应体分块写入磁盘，原子替换，多进程同时读写不会读到半个文件
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+HTTP_CACHE_DIR = '/home/node/clawd/.http_cache'
+
+
+class CachedResponse:
+    """缓存中的一次响应，响应体在磁盘上"""
+
+    def __init__(self, path: str, meta: Dict, from_cache: bool):
+        self.path = path
+        self.meta = meta
+        self.from_cache = from_cache  # True: 没有下载响应体（TTL命中或304）
+        self.status_code = 200
+
+    def open(self):
+        return open(self.path, 'rb')
+
+    @property
+    def content(self) -> bytes:
+        with self.open() as f:
+            return f.read()
+
+    def json(self):
+        with self.open() as f:
+            return json.load(f)
+
+
+class HttpCache:
+    """按 URL+参数 缓存 GET 响应"""
+
+    def __init__(self, cache_dir: str = HTTP_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.stats = {'fresh': 0, 'revalidated': 0, 'downloaded': 0}
+        self._lock = threading.Lock()
+
+    def _paths(self, url: str, params: Optional[Dict]):
+        basis = url + '?' + '&'.join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+        key = hashlib.sha1(basis.encode('utf-8')).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.json", f"{base}.body"
+
+    def _load_meta(self, meta_path: str) -> Optional[Dict]:
+        try:
+            with open(meta_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_atomic(self, path: str, write):
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            write(f)
+        os.replace(tmp, path)
+
+    def _save_meta(self, meta_path: str, meta: Dict):
+        self._write_atomic(meta_path, lambda f: f.write(json.dumps(meta).encode('utf-8')))
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def get(self, session, url: str, params: Optional[Dict] = None,
+            ttl: float = 0, timeout: float = 10) -> CachedResponse:
+        """
+        带缓存的 GET，失败时抛异常
+        ttl: 缓存新鲜期（秒），期内不发请求；0 表示每次都做条件请求
+        """
+        meta_path, body_path = self._paths(url, params)
+        meta = self._load_meta(meta_path)
+        has_body = meta is not None and os.path.exists(body_path)
+
+        if has_body and time.time() - meta['fetched_at'] < ttl:
+            self._count('fresh')
+            return CachedResponse(body_path, meta, from_cache=True)
+
+        headers = {}
+        if has_body:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        resp = session.get(url, params=params, headers=headers, timeout=timeout, stream=True)
+        try:
+            if resp.status_code == 304 and has_body:
+                meta['fetched_at'] = time.time()
+                self._save_meta(meta_path, meta)
+                self._count('revalidated')
+                return CachedResponse(body_path, meta, from_cache=True)
+
+            resp.raise_for_status()
+
+            def write_body(f):
+                for chunk in resp.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
+
+            self._write_atomic(body_path, write_body)
+        finally:
+            resp.close()
+
+        meta = {
+            'url': url,
+            'etag': resp.headers.get('ETag'),
+            'last_modified': resp.headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+        }
+        self._save_meta(meta_path, meta)
+        self._count('downloaded')
+        return CachedResponse(body_path, meta, from_cache=False)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+多关键词分类器 (Aho–Corasick)
+- 板块/主题关键词词典编译成一个自动机，一次线性扫描给新闻打上全部标签
+- 晚报板块分类、政策筛选、早报 Tavily 结果分类、monitor_sectors 共用同一个实例
+"""
+
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+# 板块词典: 标签 -> 关键词
+SECTOR_KEYWORDS = {
+    '新能源': ['新能源', '光伏', '锂电', '储能', '风电'],
+    '半导体': ['半导体', '芯片', '晶圆', '光刻'],
+    '银行': ['银行'],
+    '房地产': ['房地产', '楼市', '房企'],
+    '医药': ['医药', '创新药', '医疗'],
+    'AI': ['AI', '人工智能', '大模型', '算力'],
+    '消费': ['消费', '白酒', '零售'],
+}
+
+# 主题词典: 标签 -> 关键词（英文关键词按整词匹配，忽略大小写）
+TOPIC_KEYWORDS = {
+    'policy': ['央行', '证监会', '政策', '降准', '降息'],
+    'china_adr': ['china', 'chinese', 'alibaba', 'pdd', 'jd', '中概'],
+    'fed': ['fed', 'federal reserve', 'powell', 'rate', 'rates'],
+}
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isascii() and ch.isalnum()
+
+
+class AhoCorasick:
+    """
+    Aho–Corasick 自动机，文本统一转小写后匹配
+    纯ASCII关键词要求两侧不是字母数字（整词匹配），避免 'ai' 命中 'said'
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, object]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Tuple[str, object]]] = [[]]
+
+        for pattern, payload in patterns:
+            word = pattern.lower()
+            if not word:
+                continue
+            state = 0
+            for ch in word:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = nxt
+            self.output[state].append((word, payload))
+
+        # BFS 构建失败指针，并把后缀状态的输出合并进来
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str, object]]:
+        """逐个产出 (起始位置, 关键词, payload)"""
+        text = text.lower()
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            for word, payload in self.output[state]:
+                start = i - len(word) + 1
+                if word.isascii():
+                    if start > 0 and _is_word_char(text[start - 1]):
+                        continue
+                    if i + 1 < len(text) and _is_word_char(text[i + 1]):
+                        continue
+                yield start, word, payload
+
+
+class KeywordTagger:
+    """标签 -> 关键词词典编译出的分类器"""
+
+    def __init__(self, keyword_map: Dict[str, List[str]]):
+        self.labels = list(keyword_map)
+        self.automaton = AhoCorasick(
+            (word, label) for label, words in keyword_map.items() for word in words)
+
+    def tag(self, text: str) -> Set[str]:
+        """文本命中的全部标签"""
+        return {label for _, _, label in self.automaton.iter_matches(text)}
+
+    def tag_item(self, item: Dict) -> Set[str]:
+        """新闻命中的全部标签（标题+摘要）"""
+        return self.tag(item.get('title', '') + '\n' + item.get('summary', ''))
+
+    def group(self, items: Iterable[Dict], labels: Iterable[str] = None) -> Dict[str, List[Dict]]:
+        """按标签分组（保持原顺序），只返回有新闻的标签；labels 指定输出顺序"""
+        labels = list(labels) if labels is not None else self.labels
+        groups = {label: [] for label in labels}
+        for item in items:
+            for label in self.tag_item(item):
+                if label in groups:
+                    groups[label].append(item)
+        return {label: matched for label, matched in groups.items() if matched}
+
+
+_shared = None
+
+
+def get_tagger() -> KeywordTagger:
+    """全局共享的板块+主题分类器（首次调用时编译）"""
+    global _shared
+    if _shared is None:
+        _shared = KeywordTagger({**SECTOR_KEYWORDS, **TOPIC_KEYWORDS})
+    return _shared
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+新浪滚动新闻历史回填
+按页并发抓取（并发上限可配），翻到日期边界即停，每一轮页面一个事务批量入库
+进度写入检查点，中断后再次运行从断点继续
+
+用法:
+    python3 news_backfill.py --days 7
+    python3 news_backfill.py --days 7 --concurrency 4 --sources 新浪财经
+    python3 news_backfill.py --restart        # 忽略旧检查点重新开始
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List
+
+import requests
+
+from news_store import NewsStore
+from sina_roll import SINA_LIDS, fetch_sina_page
+
+CHECKPOINT_FILE = '/home/node/clawd/.news_backfill.json'
+PAGE_SIZE = 50
+RETRIES = 3
+
+
+class Backfill:
+    """单次回填任务"""
+
+    def __init__(self, store: NewsStore, checkpoint_file: str = CHECKPOINT_FILE,
+                 concurrency: int = 4, page_size: int = PAGE_SIZE):
+        self.store = store
+        self.checkpoint_file = checkpoint_file
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+        })
+        self.checkpoint = self._load_checkpoint()
+
+    def _load_checkpoint(self) -> Dict:
+        if os.path.exists(self.checkpoint_file):
+            try:
+                with open(self.checkpoint_file, 'r') as f:
+                    return json.load(f)
+            except Exception:
+                pass
+        return {}
+
+    def _save_checkpoint(self):
+        tmp = f"{self.checkpoint_file}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.checkpoint, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.checkpoint_file)
+
+    def _fetch_page(self, source: str, page: int) -> List[Dict]:
+        for attempt in range(RETRIES):
+            try:
+                return fetch_sina_page(self.session, source, num=self.page_size, page=page)
+            except Exception as e:
+                if attempt == RETRIES - 1:
+                    raise
+                print(f"  [{source}] 第{page}页失败，重试: {e}")
+                time.sleep(1 + attempt)
+
+    def run_source(self, source: str, until: int, restart: bool = False) -> Dict:
+        """
+        回填一个源直到 until(epoch)，返回统计
+        检查点: {源: {'until': 边界, 'next_page': 下一页, 'done': 是否完成}}
+        """
+        state = self.checkpoint.get(source)
+        if restart or not state or state.get('done'):
+            state = {'until': until, 'next_page': 1, 'done': False}
+        else:
+            until = state['until']
+            print(f"  [{source}] 从检查点继续: 第{state['next_page']}页")
+
+        stats = {'pages': 0, 'fetched': 0, 'inserted': 0}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            while not state['done']:
+                pages = list(range(state['next_page'], state['next_page'] + self.concurrency))
+                try:
+                    batches = list(pool.map(lambda p: self._fetch_page(source, p), pages))
+                except Exception as e:
+                    print(f"  [{source}] 抓取失败，已保存进度，稍后重跑即可继续: {e}")
+                    break
+
+                items = []
+                for batch in batches:
+                    stats['pages'] += 1
+                    items.extend(item for item in batch if item['ctime'] >= until)
+                    # 空页或本页已越过日期边界
+                    if len(batch) < self.page_size or (batch and batch[-1]['ctime'] < until):
+                        state['done'] = True
+                        break
+
+                stats['fetched'] += len(items)
+                added = self.store.add_many(items)
+                stats['inserted'] += len(added)
+                state['next_page'] = pages[-1] + 1
+                self.checkpoint[source] = state
+                self._save_checkpoint()
+                print(f"  [{source}] 已到第{pages[-1]}页，累计新增 {stats['inserted']} 条")
+
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='新浪新闻历史回填')
+    parser.add_argument('--days', type=int, default=7, help='回填最近N天')
+    parser.add_argument('--sources', nargs='+', default=list(SINA_LIDS), choices=list(SINA_LIDS))
+    parser.add_argument('--concurrency', type=int, default=4, help='并发页数上限')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    parser.add_argument('--restart', action='store_true', help='忽略检查点重新开始')
+    args = parser.parse_args()
+
+    until = int(time.time()) - args.days * 86400
+    print(f"📥 回填 {', '.join(args.sources)} 至 {datetime.fromtimestamp(until).strftime('%Y-%m-%d %H:%M')}")
+
+    backfill = Backfill(NewsStore(), concurrency=args.concurrency, page_size=args.page_size)
+    start = time.perf_counter()
+    for source in args.sources:
+        stats = backfill.run_source(source, until, restart=args.restart)
+        print(f"✅ {source}: {stats['pages']} 页, 抓取 {stats['fetched']} 条, 新增 {stats['inserted']} 条")
+    enriched = backfill.store.enrich_pending()
+    if enriched:
+        print(f"🏷️ 补打情绪分/个股代码 {enriched} 条")
+    print(f"耗时 {time.perf_counter() - start:.1f}s, 库中共 {backfill.store.count()} 条")
+
+
+if __name__ == "__main__":
+    main()
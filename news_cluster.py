@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+近似重复新闻聚类 (MinHash + LSH)
+- 同一条央行/证监会消息被多家媒体转载，标题略有不同
+- 标题+摘要切成字符二元组，MinHash 签名按段(band)建哈希表，
+  只和落在同一桶里的簇比较 Jaccard 相似度，不必和全部新闻逐一比较
+- 报告/推送每个簇只展示一条代表新闻，并附上来源数
+- 签名用 numpy 一次算完全部二元组×全部置换；启动时只从新闻库载入最近一段时间
+"""
+
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Set
+
+import numpy as np
+
+THRESHOLD = 0.5        # Jaccard >= 该值视为同一事件
+BANDS, ROWS = 16, 4    # 16段×4行，LSH 拐点约 (1/16)^(1/4) = 0.5
+CLUSTER_WINDOW = 5000  # 启动时从新闻库载入的最多条数
+CLUSTER_HOURS = 24     # 启动时只载入最近N小时（转载基本都在一天内）
+
+_PUNCT_RE = re.compile(r'[\s\W_]+')
+_PRIME = (1 << 31) - 1  # 取31位素数，a*h+b 在 uint64 内不溢出
+_rng = np.random.default_rng(20260205)
+_PERM_A = _rng.integers(1, _PRIME, BANDS * ROWS, dtype=np.uint64)
+_PERM_B = _rng.integers(0, _PRIME, BANDS * ROWS, dtype=np.uint64)
+_MIX = np.uint64(0x9E3779B97F4A7C15)  # 乘法哈希常数（uint64 溢出回绕即取模 2^64）
+
+
+def _clean(text: str) -> str:
+    return _PUNCT_RE.sub('', text.lower())
+
+
+def shingles(text: str) -> Set[str]:
+    """去掉空白标点后的字符二元组"""
+    text = _clean(text)
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def minhash(text: str) -> List[int]:
+    """与 shingles(text) 同一组二元组的 MinHash 签名，二元组直接由码位拼成整数再混合，不逐个调用哈希函数"""
+    points = np.frombuffer(_clean(text).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    if not len(points):
+        return [0] * len(_PERM_A)
+    codes = np.unique((points[:-1] << np.uint64(21)) | points[1:]) if len(points) > 1 else points
+    hashes = ((codes * _MIX) >> np.uint64(33)) % _PRIME
+    # (二元组数 × 置换数) 矩阵按列取最小
+    return ((np.outer(hashes, _PERM_A) + _PERM_B) % _PRIME).min(axis=0).tolist()
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _source_of(item: Dict) -> str:
+    return item.get('media') or item.get('source', '')
+
+
+class NewsClusters:
+    """流式近似重复聚类"""
+
+    def __init__(self, threshold: float = THRESHOLD):
+        self._lock = threading.Lock()
+        self.threshold = threshold
+        self.tables: List[Dict[tuple, List[int]]] = [{} for _ in range(BANDS)]
+        self.features: Dict[int, Set[str]] = {}  # 簇id -> 代表新闻的二元组
+        self.bands: Dict[int, List[tuple]] = {}  # 簇id -> 代表新闻的各段签名
+        self.members: Dict[int, List[Dict]] = {}  # 簇id -> 成员新闻
+        self.latest: Dict[int, int] = {}  # 簇id -> 最新成员的发布时间
+        self.cluster_of: Dict[str, int] = {}  # 新闻key -> 簇id
+        self.next_id = 0  # 簇id 单调递增，淘汰后不复用
+
+    @classmethod
+    def from_store(cls, store, window: int = CLUSTER_WINDOW, hours: float = CLUSTER_HOURS) -> 'NewsClusters':
+        clusters = cls()
+        # 按时间正序加入，让最早的报道成为簇的代表
+        clusters.add(reversed(store.recent(window, since=int(time.time() - hours * 3600))))
+        return clusters
+
+    def _assign(self, item: Dict) -> int:
+        text = item.get('title', '') + item.get('summary', '')
+        features = shingles(text)
+        signature = minhash(text)
+        bands = [tuple(signature[i * ROWS:(i + 1) * ROWS]) for i in range(BANDS)]
+        ts = item.get('ctime') or int(time.time())
+
+        candidates = set()
+        for table, band in zip(self.tables, bands):
+            candidates.update(table.get(band, ()))
+        best, best_sim = None, self.threshold
+        for cid in candidates:
+            sim = jaccard(features, self.features[cid])
+            if sim >= best_sim:
+                best, best_sim = cid, sim
+        if best is not None:
+            self.members[best].append(item)
+            self.latest[best] = max(self.latest[best], ts)
+            return best
+
+        cid = self.next_id
+        self.next_id += 1
+        self.features[cid] = features
+        self.bands[cid] = bands
+        self.members[cid] = [item]
+        self.latest[cid] = ts
+        for table, band in zip(self.tables, bands):
+            table.setdefault(band, []).append(cid)
+        return cid
+
+    def add(self, items: Iterable[Dict]):
+        """增量加入新闻（需带 'key'），已加入过的忽略"""
+        with self._lock:
+            for item in items:
+                if item['key'] not in self.cluster_of:
+                    self.cluster_of[item['key']] = self._assign(item)
+
+    def evict(self, before: int) -> int:
+        """淘汰最新成员早于 before 的簇，返回淘汰簇数（常驻进程定期调用，内存不随运行时间增长）"""
+        with self._lock:
+            stale = [cid for cid, ts in self.latest.items() if ts < before]
+            for cid in stale:
+                for table, band in zip(self.tables, self.bands.pop(cid)):
+                    bucket = table[band]
+                    bucket.remove(cid)
+                    if not bucket:
+                        del table[band]
+                for item in self.members.pop(cid):
+                    self.cluster_of.pop(item['key'], None)
+                del self.features[cid], self.latest[cid]
+            return len(stale)
+
+    def collapse(self, items: List[Dict]) -> List[Dict]:
+        """
+        每个簇只保留列表中第一次出现的那条，保持原顺序
+        返回的条目附带 'cluster_size'（簇内报道数）和 'source_count'（不同来源数）
+        """
+        self.add(item for item in items if 'key' in item)
+        seen = set()
+        result = []
+        with self._lock:
+            for item in items:
+                cid = self.cluster_of.get(item.get('key'))
+                if cid is None:
+                    result.append(item)
+                    continue
+                if cid in seen:
+                    continue
+                seen.add(cid)
+                members = self.members[cid]
+                result.append(dict(item,
+                                   cluster_size=len(members),
+                                   source_count=len({_source_of(m) for m in members})))
+        return result
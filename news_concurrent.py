@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+新闻源并发抓取
+所有源同时发起，共享一个截止时间，超时的源直接丢弃
+总耗时 ≈ 最慢的单个源，而不是各源之和
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Tuple
+
+DEFAULT_DEADLINE = 12.0  # 秒，略大于单源请求超时(8-10s)
+
+
+def fetch_concurrently(tasks: Dict[str, Callable[[], List[Dict]]],
+                       deadline: float = DEFAULT_DEADLINE) -> Tuple[Dict[str, List[Dict]], Dict[str, Dict]]:
+    """
+    并发执行多个新闻源抓取
+
+    Args:
+        tasks: {源名称: 无参抓取函数}
+        deadline: 共享截止时间（秒），到点未完成的源不再等待
+
+    Returns:
+        (results, timing)
+        results: {源名称: 新闻列表}，只包含按时完成的源
+        timing:  {源名称: {'status': ok/error/timeout, 'elapsed': 秒, 'count': 条数}}
+    """
+    results = {}
+    timing = {}
+    if not tasks:
+        return results, timing
+
+    finished_at = {}
+
+    def run(name, func):
+        try:
+            return func()
+        finally:
+            finished_at[name] = time.perf_counter()
+
+    start = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix='news')
+    futures = {executor.submit(run, name, func): name for name, func in tasks.items()}
+    done, _ = wait(futures, timeout=deadline)
+    # 不等待超时的源，让它们在后台自行结束
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    for future, name in futures.items():
+        if future not in done:
+            timing[name] = {'status': 'timeout', 'elapsed': round(deadline, 3), 'count': 0}
+            continue
+
+        elapsed = round(finished_at.get(name, time.perf_counter()) - start, 3)
+        try:
+            items = future.result() or []
+        except Exception as e:
+            print(f"[错误] {name}: {e}")
+            timing[name] = {'status': 'error', 'elapsed': elapsed, 'count': 0}
+            continue
+
+        results[name] = items
+        timing[name] = {'status': 'ok', 'elapsed': elapsed, 'count': len(items)}
+
+    return results, timing
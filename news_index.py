@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+新闻倒排索引（内存）
+- 中文按单字 + 二元组(bigram)切分，英文/数字切成 1~3 字符的 n-gram，
+  与原来的子串匹配语义一致（rate 命中 rates，ai 命中 OpenAI），倒排只做候选过滤
+- 新闻入库时增量更新，关键词/多板块查询变成倒排表求交，不再逐条扫描
+- 入库时顺带用共享分类器打标签，已知板块直接查标签倒排表
+"""
+
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+INDEX_WINDOW = 5000  # 启动时从新闻库载入的最近条数
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+_CJK_RE = re.compile(r'[一-鿿]+')
+NGRAM = 3  # 英文/数字 n-gram 最大长度
+
+
+def _ngrams(word: str, n: int) -> Set[str]:
+    return {word[i:i + n] for i in range(len(word) - n + 1)}
+
+
+def tokenize(text: str) -> Set[str]:
+    """文本 -> 词项集合"""
+    text = text.lower()
+    tokens = set()
+    for word in _WORD_RE.findall(text):
+        for n in range(1, NGRAM + 1):
+            tokens.update(_ngrams(word, n))
+    for run in _CJK_RE.findall(text):
+        tokens.update(run)
+        tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def query_tokens(keyword: str) -> Set[str]:
+    """查询词 -> 必须全部命中的词项（中文只用二元组，单字词才用单字；英文长词用三元组，短词整词）"""
+    keyword = keyword.lower()
+    tokens = set()
+    for word in _WORD_RE.findall(keyword):
+        tokens.update(_ngrams(word, NGRAM) if len(word) > NGRAM else {word})
+    for run in _CJK_RE.findall(keyword):
+        if len(run) == 1:
+            tokens.add(run)
+        else:
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def item_text(item: Dict) -> str:
+    return (item.get('title', '') + item.get('summary', '')).lower()
+
+
+class NewsIndex:
+    """新闻倒排索引: 词项 -> 新闻key集合"""
+
+    def __init__(self, tagger=None):
+        self._lock = threading.Lock()
+        self.tagger = tagger
+        self.postings: Dict[str, Set[str]] = {}
+        self.tag_postings: Dict[str, Set[str]] = {}
+        self.docs: Dict[str, Dict] = {}
+        self.texts: Dict[str, str] = {}
+
+    @classmethod
+    def from_store(cls, store, window: int = INDEX_WINDOW, tagger=None) -> 'NewsIndex':
+        index = cls(tagger)
+        index.add(store.recent(window))
+        return index
+
+    def add(self, items: Iterable[Dict]):
+        """增量加入新闻（需带 'key'），重复的key忽略"""
+        with self._lock:
+            for item in items:
+                key = item['key']
+                if key in self.docs:
+                    continue
+                text = item_text(item)
+                if self.tagger is not None:
+                    item = dict(item, tags=sorted(self.tagger.tag_item(item)))
+                    for tag in item['tags']:
+                        self.tag_postings.setdefault(tag, set()).add(key)
+                self.docs[key] = item
+                self.texts[key] = text
+                for token in tokenize(text):
+                    self.postings.setdefault(token, set()).add(key)
+
+    def evict(self, before: int) -> int:
+        """删除发布时间早于 before 的新闻，返回删除条数（常驻进程定期调用，内存不随运行时间增长）"""
+        with self._lock:
+            stale = [key for key, doc in self.docs.items() if doc.get('ctime', 0) < before]
+            for key in stale:
+                doc = self.docs.pop(key)
+                for postings, terms in ((self.postings, tokenize(self.texts.pop(key))),
+                                        (self.tag_postings, doc.get('tags', ()))):
+                    for term in terms:
+                        keys = postings.get(term)
+                        if keys is not None:
+                            keys.discard(key)
+                            if not keys:
+                                del postings[term]
+            return len(stale)
+
+    def _match(self, keyword: str) -> Set[str]:
+        """倒排表求交得到候选，再用原文子串确认（二元组只能保证必要条件）"""
+        tokens = query_tokens(keyword)
+        if not tokens:
+            return set()
+        lists = sorted((self.postings.get(t, set()) for t in tokens), key=len)
+        candidates = set(lists[0]).intersection(*lists[1:])
+        keyword = keyword.lower()
+        return {key for key in candidates if keyword in self.texts[key]}
+
+    def _select(self, keys: Set[str], limit: int, since: Optional[int]) -> List[Dict]:
+        with self._lock:
+            docs = [self.docs[key] for key in keys]
+        if since is not None:
+            docs = [d for d in docs if d.get('ctime', 0) >= since]
+        docs.sort(key=lambda d: d.get('ctime', 0), reverse=True)
+        return docs[:limit]
+
+    def search(self, keyword: str, limit: int = 10, since: Optional[int] = None) -> List[Dict]:
+        """关键词查询，按发布时间倒序"""
+        with self._lock:
+            keys = self._match(keyword)
+        return self._select(keys, limit, since)
+
+    def by_tag(self, tag: str, limit: int = 10, since: Optional[int] = None) -> List[Dict]:
+        """按分类器标签查询，按发布时间倒序"""
+        with self._lock:
+            keys = set(self.tag_postings.get(tag, ()))
+        return self._select(keys, limit, since)
+
+    def search_many(self, keywords: List[str], limit: int = 5,
+                    since: Optional[int] = None) -> Dict[str, List[Dict]]:
+        """多关键词（如多个板块）查询，只返回有结果的关键词；分类器认识的板块走标签"""
+        labels = set(self.tagger.labels) if self.tagger is not None else set()
+        result = {}
+        for keyword in keywords:
+            if keyword in labels:
+                matched = self.by_tag(keyword, limit, since)
+            else:
+                matched = self.search(keyword, limit, since)
+            if matched:
+                result[keyword] = matched
+        return result
+
+    def __len__(self):
+        return len(self.docs)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+TradeGod 快讯推送守护进程
+常驻轮询新浪两个频道（增量抓取 + 条件请求），新闻入库去重、合并转载，
+命中订阅关键词/关注个股的快讯附上行情快照后立即推送钉钉
+统计 发布->推送 延迟，稳态目标 30 秒以内
+
+用法:
+    python3 news_pusher.py                        # 默认订阅: 政策 + 关注个股
+    python3 news_pusher.py --keywords 央行 降准 英伟达 --interval 10
+    python3 news_pusher.py --dry-run --once       # 只打印不推送，跑一轮
+"""
+
+import sys
+sys.path.insert(0, '/home/node/clawd')
+
+import argparse
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List
+
+from tradegod_news import TradeGodNews
+from keyword_tagger import KeywordTagger, TOPIC_KEYWORDS
+from stock_linker import WATCHED_SYMBOLS
+from news_quotes import format_quote
+from dingtalk_notifier import send_dingtalk_message
+
+SUBSCRIPTIONS_FILE = '/home/node/clawd/.news_subscriptions.json'
+STATS_FILE = '/home/node/clawd/.news_pusher_stats.json'
+
+POLL_INTERVAL = 10       # 交易时段轮询间隔（秒）
+IDLE_INTERVAL = 60       # 夜间轮询间隔（秒）
+MAX_BACKOFF = 120        # 连续失败时的最长间隔（秒）
+MAX_AGE = 600            # 超过10分钟的旧闻不推送（重启后水位落后时避免刷屏）
+LATENCY_TARGET = 30      # 发布->推送 目标延迟（秒）
+
+
+def default_subscriptions() -> Dict[str, List[str]]:
+    """订阅配置: 订阅名 -> 关键词；文件不存在时用 政策主题 + 关注个股"""
+    if os.path.exists(SUBSCRIPTIONS_FILE):
+        with open(SUBSCRIPTIONS_FILE, 'r') as f:
+            return json.load(f)
+    subs = {'政策': TOPIC_KEYWORDS['policy']}
+    for sym in WATCHED_SYMBOLS:
+        subs[sym['name']] = [sym['name'], sym['short'], sym['code']] + sym['aliases']
+    return subs
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+class NewsPusher:
+    """快讯推送器"""
+
+    def __init__(self, subscriptions: Dict[str, List[str]], interval: float = POLL_INTERVAL,
+                 dry_run: bool = False):
+        self.news = TradeGodNews()
+        self.tagger = KeywordTagger(subscriptions)
+        self.interval = interval
+        self.dry_run = dry_run
+        self.pushed_clusters = set()  # 已推送成功的簇id（不复用，随聚类淘汰一起清理）
+        self.pending: List[Dict] = []  # 发送失败待重试的快讯，下一轮在 MAX_AGE 内重发
+        self.latencies = deque(maxlen=1000)  # 发布->推送（秒）
+        self.detect_lags = deque(maxlen=1000)  # 发布->抓到（秒）
+        self.failures = 0
+        self.polls = 0
+
+    def select(self, items: List[Dict], now: float) -> List[Dict]:
+        """
+        过滤出需要推送的新闻：足够新、命中订阅、所在转载簇还没推过（同一批内每簇一条）
+        只做挑选，发送成功后才记入 pushed_clusters
+        """
+        selected, batch = [], set()
+        for item in sorted(items, key=lambda n: n['ctime']):
+            if now - item['ctime'] > MAX_AGE:
+                continue
+            matched = self.tagger.tag_item(item)
+            if not matched:
+                continue
+            cluster = self.news.clusters.cluster_of.get(item['key'])
+            if cluster is not None:
+                if cluster in self.pushed_clusters or cluster in batch:
+                    continue
+                batch.add(cluster)
+            selected.append(dict(item, matched=sorted(matched), cluster=cluster))
+        return selected
+
+    def format_message(self, items: List[Dict]) -> str:
+        lines = [f"## ⚡ TradeGod 快讯 ({len(items)}条)\n"]
+        for n in items:
+            lines.append(f"**[{n['time']}] {n['title']}**  ")
+            lines.append(f"订阅: {' / '.join(n['matched'])} | 来源: {n.get('media') or n['source']}  ")
+            for quote in n.get('quotes', []):
+                lines.append(f"📈 {format_quote(quote)}  ")
+            if n.get('url'):
+                lines.append(f"[原文]({n['url']})")
+            lines.append("")
+        lines.append("---\n*TradeGod 快讯推送*")
+        return "\n".join(lines)
+
+    def poll_once(self) -> int:
+        """轮询一次，返回推送条数"""
+        self.polls += 1
+        # 从本进程水位之后抓到的条目里选，而不是只看新入库的：
+        # 早晚报、回填等其它进程也写同一个新闻库，先入库的快讯不能因此漏推
+        new_items = self.news.poll_fetched(page_size=20, ttl=0)
+        fetched_at = time.time()
+        if not any(t['status'] == 'ok' for t in self.news.last_timing.values()):
+            raise RuntimeError(f"全部新闻源失败: {self.news.last_timing}")
+
+        for item in new_items:
+            if fetched_at - item['ctime'] <= MAX_AGE:
+                self.detect_lags.append(fetched_at - item['ctime'])
+
+        # 上一轮发送失败的快讯和本轮新抓到的一起挑选，超过 MAX_AGE 的自然丢弃
+        candidates = {item['key']: item for item in self.pending}
+        candidates.update((item['key'], item) for item in new_items)
+        self.pending = []
+        selected = self.select(list(candidates.values()), fetched_at)
+        if not selected:
+            return 0
+
+        self.news.snapshot_quotes(selected)
+        content = self.format_message(selected)
+        if self.dry_run:
+            print(content)
+        elif not send_dingtalk_message(content, title=f"TradeGod快讯: {selected[0]['title'][:20]}"):
+            # send_dingtalk_message 出错只返回 False：留待下一轮重发，不计延迟
+            self.pending = selected
+            raise RuntimeError(f"钉钉推送失败，{len(selected)} 条快讯下轮重试")
+
+        self.pushed_clusters.update(item['cluster'] for item in selected if item['cluster'] is not None)
+        pushed_at = time.time()
+        for item in selected:
+            latency = pushed_at - item['ctime']
+            self.latencies.append(latency)
+            flag = '' if latency <= LATENCY_TARGET else ' ⚠️超过目标'
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] 推送 {item['title'][:30]} 延迟 {latency:.1f}s{flag}")
+        return len(selected)
+
+    def evict(self):
+        """淘汰超过24小时的内存索引/聚类和已推送记录，守护进程内存不随运行时间增长"""
+        evicted = self.news.evict()
+        self.pushed_clusters &= set(self.news.clusters.members)
+        print(f"🧹 淘汰旧新闻: 索引 {evicted['index']} 条, 聚类 {evicted['clusters']} 簇")
+
+    def latency_stats(self) -> Dict:
+        """延迟统计（秒）"""
+        stats = {'polls': self.polls, 'pushed': len(self.latencies), 'target': LATENCY_TARGET}
+        for name, values in (('push', self.latencies), ('detect', self.detect_lags)):
+            if values:
+                values = list(values)
+                stats[name] = {
+                    'p50': round(percentile(values, 0.5), 1),
+                    'p95': round(percentile(values, 0.95), 1),
+                    'max': round(max(values), 1),
+                    'within_target': round(sum(v <= LATENCY_TARGET for v in values) / len(values), 3),
+                }
+        return stats
+
+    def save_stats(self):
+        stats = dict(self.latency_stats(), updated=datetime.now().isoformat())
+        tmp = f"{STATS_FILE}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, STATS_FILE)
+
+    def next_interval(self) -> float:
+        """交易日 7:00-23:00 高频轮询，夜间放慢；连续失败指数退避"""
+        if self.failures:
+            return min(MAX_BACKOFF, self.interval * 2 ** self.failures)
+        now = datetime.now()
+        if now.weekday() >= 5 or not 7 <= now.hour < 23:
+            return IDLE_INTERVAL
+        return self.interval
+
+    def run(self, once: bool = False):
+        print(f"🚀 快讯推送启动 | 订阅 {len(self.tagger.labels)} 组 | 间隔 {self.interval}s")
+        last_report = time.time()
+        while True:
+            started = time.time()
+            try:
+                self.poll_once()
+                self.failures = 0
+            except Exception as e:
+                self.failures += 1
+                print(f"[错误] 轮询失败({self.failures}): {e}")
+
+            if once:
+                break
+            if time.time() - last_report >= 3600:
+                print(f"📊 延迟统计: {json.dumps(self.latency_stats(), ensure_ascii=False)}")
+                self.save_stats()
+                self.evict()
+                last_report = time.time()
+            # 轮询间隔从本轮开始算，抓取耗时不累加到延迟上
+            time.sleep(max(0.0, self.next_interval() - (time.time() - started)))
+
+        self.save_stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='TradeGod 快讯推送守护进程')
+    parser.add_argument('--keywords', nargs='+', help='订阅关键词（每个关键词单独一组），默认读订阅文件')
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help='轮询间隔（秒）')
+    parser.add_argument('--dry-run', action='store_true', help='只打印不推送')
+    parser.add_argument('--once', action='store_true', help='只轮询一次')
+    args = parser.parse_args()
+
+    subs = {k: [k] for k in args.keywords} if args.keywords else default_subscriptions()
+    pusher = NewsPusher(subs, interval=args.interval, dry_run=args.dry_run)
+    try:
+        pusher.run(once=args.once)
+    except KeyboardInterrupt:
+        pusher.save_stats()
+        print(f"\n📊 延迟统计: {json.dumps(pusher.latency_stats(), ensure_ascii=False)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+新闻触发的批量行情快照
+一批新闻里提到的全部股票合并成一次腾讯行情请求，
+把 价格/涨跌幅/成交量 附到每条新闻上，推送前就能看到价格有没有反应
+"""
+
+import re
+from typing import Dict, Iterable, List
+
+import requests
+
+TENCENT_QUOTE_URL = "https://qt.gtimg.cn/q="
+MAX_SYMBOLS_PER_REQUEST = 200  # 单个URL的安全上限，一批新闻通常远小于此
+
+_LINE_RE = re.compile(r'v_(?:sh|sz|bj)(\d{6})="(.*)"')
+
+
+def tencent_symbol(code: str) -> str:
+    """6位代码 -> 腾讯行情代码 (sh/sz/bj 前缀)"""
+    if code.startswith(('6', '9')):
+        return f"sh{code}"
+    if code.startswith(('4', '8')):
+        return f"bj{code}"
+    return f"sz{code}"
+
+
+class AShareQuoteFetcher:
+    """A股实时行情（腾讯财经，批量）"""
+
+    def __init__(self, session=None):
+        self.session = session or requests.Session()
+
+    def get_quotes(self, codes: Iterable[str]) -> Dict[str, Dict]:
+        """批量获取行情，返回 {代码: {name, price, change_pct, volume, update_time}}"""
+        codes = list(dict.fromkeys(codes))
+        result = {}
+        for i in range(0, len(codes), MAX_SYMBOLS_PER_REQUEST):
+            chunk = codes[i:i + MAX_SYMBOLS_PER_REQUEST]
+            url = TENCENT_QUOTE_URL + ','.join(tencent_symbol(c) for c in chunk)
+            try:
+                response = self.session.get(url, timeout=10)
+                response.encoding = 'gb2312'
+            except Exception as e:
+                print(f"获取A股行情失败: {e}")
+                continue
+
+            for line in response.text.strip().split(';'):
+                match = _LINE_RE.search(line)
+                if not match:
+                    continue
+                data = match.group(2).split('~')
+                if len(data) < 38:
+                    continue
+                result[match.group(1)] = {
+                    'code': match.group(1),
+                    'name': data[1],
+                    'price': float(data[3]) if data[3] else 0,
+                    'change_pct': float(data[32]) if data[32] else 0,
+                    'volume': int(data[36]) if data[36] else 0,  # 手
+                    'update_time': data[30],
+                }
+        return result
+
+
+def attach_quotes(items: List[Dict], fetcher: AShareQuoteFetcher, linker=None) -> Dict[str, Dict]:
+    """
+    推送前的行情快照阶段
+    收集整批新闻的 'codes'（缺失时用 linker 现场识别），一次请求拿全部行情，
+    每条新闻写入 'quotes' 列表；返回本批全部行情
+    """
+    codes = []
+    for item in items:
+        if 'codes' not in item and linker is not None:
+            item['codes'] = linker.link_item(item)
+        codes.extend(item.get('codes', ()))
+
+    quotes = fetcher.get_quotes(codes) if codes else {}
+    for item in items:
+        item['quotes'] = [quotes[c] for c in item.get('codes', ()) if c in quotes]
+    return quotes
+
+
+def format_quote(quote: Dict) -> str:
+    """行情一行摘要，如: 寒武纪(688256) ¥580.00 +3.25% 量12.3万手"""
+    volume = quote['volume']
+    vol_str = f"{volume / 10000:.1f}万手" if volume >= 10000 else f"{volume}手"
+    return f"{quote['name']}({quote['code']}) ¥{quote['price']:.2f} {quote['change_pct']:+.2f}% 量{vol_str}"
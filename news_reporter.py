@@ -9,7 +9,9 @@ import sys
 sys.path.insert(0, '/home/node/clawd')
 
 from tradegod_news import TradeGodNews
-from tavily_monitor import TavilyMonitor, check_before_report
+from tavily_monitor import check_before_report
+from keyword_tagger import get_tagger, SECTOR_KEYWORDS
+from news_sentiment import sector_sentiment, format_sentiment
 from datetime import datetime
 import json
 import os
@@ -19,14 +21,29 @@ class NewsReporter:
     
     def __init__(self):
         self.news = TradeGodNews()
-        self.monitor = TavilyMonitor()
+        self.monitor = self.news.tavily_monitor
+        self.tagger = get_tagger()
         self.api_calls = 0
+        self.cache_hits = 0
     
-    def log_api_call(self, purpose: str):
-        """记录API调用"""
+    def log_api_call(self, purpose: str, result: dict):
+        """统计API调用（额度由 search_tavily 按实际消耗记账），缓存命中不计数"""
+        budget = result.get('budget')
+        note = f" ({budget['action']}: {budget['reason']})" if budget and budget['action'] != 'search' else ""
+        if result.get('from_cache'):
+            self.cache_hits += 1
+            print(f"  [缓存] {purpose}{note}")
+            return
+        if 'from_cache' not in result:  # 未发出请求（未配置Key）
+            return
         self.api_calls += 1
-        self.monitor.record_call(purpose)
-        print(f"  [API {self.api_calls}] {purpose}")
+        print(f"  [API {self.api_calls}] {purpose}{note}")
+    
+    @staticmethod
+    def _cluster_note(n: dict) -> str:
+        """近似重复簇的来源数提示"""
+        count = n.get('source_count', 1)
+        return f" ({count}家来源)" if count > 1 else ""
     
     def generate_morning_report(self) -> str:
         """
@@ -100,22 +117,23 @@ class NewsReporter:
         report.append("\n📰 【深度分析】重要新闻解读")
         report.append("-" * 70)
         
-        self.log_api_call("美股深度搜索")
         us_market = self.news.search_tavily(
             "US stock market yesterday close China ADR Alibaba PDD Fed interest rate news",
             max_results=8,
             include_answer=True,
-            search_depth="advanced"
+            search_depth="advanced",
+            query_class="report",
+            job="morning"
         )
+        self.log_api_call("美股深度搜索", us_market)
         
         if 'answer' in us_market and us_market['answer']:
             report.append(f"\n💡 市场解读:\n{us_market['answer'][:250]}")
         
-        # 分类新闻
-        china_news = [r for r in us_market.get('results', []) 
-                     if any(k in r.get('title','').lower() for k in ['china', 'alibaba', 'pdd', 'jd', '中概'])]
-        fed_news = [r for r in us_market.get('results', []) 
-                   if any(k in r.get('title','').lower() for k in ['fed', 'powell', 'rate'])]
+        # 分类新闻（共享分类器，一次扫描）
+        us_groups = self.tagger.group(us_market.get('results', []))
+        china_news = us_groups.get('china_adr', [])
+        fed_news = us_groups.get('fed', [])
         
         if china_news:
             report.append(f"\n🏮 中概股相关:")
@@ -132,7 +150,7 @@ class NewsReporter:
         report.append("-" * 70)
         
         # 获取A股早盘新闻
-        a_news = self.news.fetch_a_stock(10)
+        a_news = self.news.clusters.collapse(self.news.fetch_a_stock(10))
         
         # 根据美股情况给出具体建议
         report.append(f"\n🎯 基于美股表现的应对策略:\n")
@@ -158,14 +176,14 @@ class NewsReporter:
         
         # 重要新闻
         if a_news:
-            policy_news = [n for n in a_news if any(k in n['title'] for k in ['央行', '政策', '证监会'])]
+            policy_news = self.tagger.group(a_news).get('policy', [])
             if policy_news:
                 report.append(f"\n📜 国内政策动向:")
                 for n in policy_news[:2]:
-                    report.append(f"   • [{n['source']}] {n['title'][:50]}...")
+                    report.append(f"   • [{n['source']}] {n['title'][:50]}...{self._cluster_note(n)}")
         
         report.append("\n" + "=" * 70)
-        report.append(f"✅ 报告完成 | API调用: {self.api_calls}次")
+        report.append(f"✅ 报告完成 | API调用: {self.api_calls}次 (缓存命中{self.cache_hits}次)")
         report.append("=" * 70)
         
         return "\n".join(report)
@@ -187,47 +205,36 @@ class NewsReporter:
         report.append("\n🇨🇳 【A股复盘】今日市场表现")
         report.append("-" * 50)
         
-        a_news = self.news.fetch_a_stock(25)
+        # 近似重复的转载合并成一条
+        a_news = self.news.clusters.collapse(self.news.fetch_a_stock(25))
         report.append(f"今日要闻共 {len(a_news)} 条\n")
         
-        # 按板块分类
-        sectors_map = {
-            '新能源': [],
-            '半导体': [],
-            '银行': [],
-            '房地产': [],
-            '医药': [],
-            'AI': [],
-            '消费': []
-        }
-        
-        for n in a_news:
-            title_summary = n['title'] + n.get('summary', '')
-            for sector in sectors_map.keys():
-                if sector in title_summary:
-                    sectors_map[sector].append(n)
+        # 按板块/主题分类（共享分类器，每条新闻只扫描一次）
+        groups = self.tagger.group(a_news)
+        sentiment = sector_sentiment(a_news, self.tagger)
         
         # 展示有新闻的板块
         has_news = False
-        for sector, items in sectors_map.items():
+        for sector in SECTOR_KEYWORDS:
+            items = groups.get(sector)
             if items:
                 if not has_news:
                     report.append("🔥 热点板块:")
                     has_news = True
-                report.append(f"\n【{sector}】")
+                report.append(f"\n【{sector}】 {format_sentiment(sentiment.get(sector))}")
                 for n in items[:2]:
-                    report.append(f"  • {n['title'][:45]}...")
+                    report.append(f"  • {n['title'][:45]}...{self._cluster_note(n)}")
         
         # 2. 政策要闻（RSS，免费）
         report.append("\n📜 【政策动向】")
         report.append("-" * 50)
         
-        policy_keywords = ['央行', '证监会', '政策', '降准', '降息']
-        policy_news = [n for n in a_news if any(k in n['title'] for k in policy_keywords)]
+        policy_news = groups.get('policy', [])
         
         if policy_news:
+            report.append(f"  {format_sentiment(sentiment.get('policy'))}")
             for n in policy_news[:4]:
-                report.append(f"  • [{n['source']}] {n['title'][:50]}...")
+                report.append(f"  • [{n['source']}] {n['title'][:50]}...{self._cluster_note(n)}")
         else:
             report.append("  今日无重大政策新闻")
         
@@ -235,13 +242,15 @@ class NewsReporter:
         report.append("\n🌙 【美股前瞻】夜盘预判")
         report.append("-" * 50)
         
-        self.log_api_call("美股盘前+中概股预期")
         us_premarket = self.news.search_tavily(
             "US stock futures premarket China ADR reaction A-shares impact",
             max_results=8,
             include_answer=True,
-            search_depth="advanced"
+            search_depth="advanced",
+            query_class="report",
+            job="evening"
         )
+        self.log_api_call("美股盘前+中概股预期", us_premarket)
         
         if 'answer' in us_premarket and us_premarket['answer']:
             report.append(f"📊 盘前预期:\n{us_premarket['answer'][:250]}...")
@@ -269,7 +278,7 @@ class NewsReporter:
         report.append("  • 重要经济数据(非农/CPI/零售等)")
         
         report.append("\n" + "=" * 60)
-        report.append(f"报告完成 | API调用: {self.api_calls}次 | 晚安！🌙")
+        report.append(f"报告完成 | API调用: {self.api_calls}次 (缓存命中{self.cache_hits}次) | 晚安！🌙")
         report.append("=" * 60)
         
         return "\n".join(report)
@@ -294,21 +303,23 @@ if __name__ == "__main__":
     
     args = parser.parse_args()
     
-    # 检查额度
-    if not check_before_report():
+    reporter = NewsReporter()
+    
+    # 检查额度（用报告实际使用的用量库，指向替身服务时不受真实额度影响）
+    if not check_before_report(args.type, reporter.monitor):
         print("\n❌ 额度不足，跳过报告生成")
         print("💡 建议: 使用RSS源继续获取A股新闻（不消耗API额度）")
         sys.exit(1)
     
-    reporter = NewsReporter()
-    
     if args.type == 'morning':
         report = reporter.generate_morning_report()
     else:
         report = reporter.generate_evening_report()
     
     print(report)
-    print(f"\n📊 本次报告共调用 Tavily API: {reporter.api_calls} 次")
+    print(f"\n📊 本次报告共调用 Tavily API: {reporter.api_calls} 次，缓存命中 {reporter.cache_hits} 次")
+    cache = reporter.news.tavily_cache.summary()
+    print(f"📦 Tavily缓存累计: 命中 {cache['hit']} / 未命中 {cache['miss']} (命中率 {cache['hit_rate']:.0%})，缓存 {cache['entries']} 条")
     
     # 显示额度状态
     print("\n")
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+新闻情绪打分（中英文金融词典）
+- 正/负面词、否定词编译进同一个 Aho–Corasick 自动机，每条新闻一次线性扫描
+- 分数在 (-1, 1) 之间，入库后按板块/个股聚合，供报告和异动提醒使用
+"""
+
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional
+
+from keyword_tagger import AhoCorasick
+
+# 词 -> 权重（强烈词 2，一般词 1）
+POSITIVE_WORDS = {
+    '涨停': 2, '大涨': 2, '暴涨': 2, '创新高': 2, '超预期': 2, '扭亏': 2, '预增': 2,
+    '上涨': 1, '走强': 1, '反弹': 1, '回升': 1, '拉升': 1, '突破': 1, '新高': 1,
+    '增长': 1, '增持': 1, '回购': 1, '分红': 1, '盈利': 1, '利好': 1, '提振': 1,
+    '获批': 1, '中标': 1, '签约': 1, '净流入': 1, '上调': 1, '看好': 1, '降准': 1, '降息': 1,
+    'surge': 2, 'soar': 2, 'record high': 2, 'beat estimates': 2,
+    'rally': 1, 'gain': 1, 'gains': 1, 'rise': 1, 'rises': 1, 'jump': 1, 'jumps': 1,
+    'upgrade': 1, 'beat': 1, 'profit': 1, 'growth': 1, 'bullish': 1, 'rebound': 1,
+}
+NEGATIVE_WORDS = {
+    '跌停': 2, '大跌': 2, '暴跌': 2, '跳水': 2, '爆雷': 2, '暴雷': 2, '立案': 2, '退市': 2,
+    '预亏': 2, '不及预期': 2, '低于预期': 1,
+    '下跌': 1, '走弱': 1, '下滑': 1, '回落': 1, '新低': 1, '亏损': 1, '预减': 1, '减持': 1,
+    '利空': 1, '违规': 1, '处罚': 1, '调查': 1, '违约': 1, '诉讼': 1, '承压': 1, '萎缩': 1,
+    '净流出': 1, '下调': 1, '收紧': 1, '加息': 1, '制裁': 1, '裁员': 1, '风险': 1,
+    'plunge': 2, 'crash': 2, 'tumble': 2, 'bankruptcy': 2, 'misses estimates': 2,
+    'fall': 1, 'falls': 1, 'drop': 1, 'drops': 1, 'slump': 1, 'decline': 1, 'loss': 1,
+    'downgrade': 1, 'miss': 1, 'lawsuit': 1, 'probe': 1, 'bearish': 1, 'default': 1, 'selloff': 1,
+}
+# 否定词: 紧跟其后的情绪词取反
+# 英文词要求左右都是词边界，"n't" 单独写永远匹配不上，缩写按整词列出（含弯引号写法）
+_CONTRACTIONS = ['do', 'does', 'did', 'is', 'are', 'was', 'were', 'has', 'have', 'had',
+                 'wo', 'would', 'ca', 'could', 'should']
+NEGATIONS = ['不', '未', '没有', '无', '并非', '难以', 'not', 'no', 'never', 'cannot']
+NEGATIONS += [f"{verb}n{apostrophe}t" for verb in _CONTRACTIONS for apostrophe in "'’"]
+# 以否定字开头但不表否定的词，按最左最长匹配盖过否定词
+NEUTRAL_WORDS = ['不断', '不少', '不仅', '无论', '未来', '无人机', 'no.']
+NEGATION_SPAN = 4  # 否定词结尾到情绪词开头的最大字符距离
+SMOOTHING = 1.0    # 分数 = 权重和 / (绝对权重和 + SMOOTHING)，单个一般词 ±0.5
+
+_NEGATE = 'neg'
+
+
+class SentimentScorer:
+    """词典情绪打分器"""
+
+    def __init__(self, positive: Dict[str, float] = POSITIVE_WORDS,
+                 negative: Dict[str, float] = NEGATIVE_WORDS):
+        patterns = [(word, weight) for word, weight in positive.items()]
+        patterns += [(word, -weight) for word, weight in negative.items()]
+        patterns += [(word, _NEGATE) for word in NEGATIONS]
+        patterns += [(word, 0) for word in NEUTRAL_WORDS]
+        self.automaton = AhoCorasick(patterns)
+
+    def score(self, text: str) -> float:
+        """文本情绪分，无情绪词时为 0"""
+        matches = sorted(self.automaton.iter_matches(text), key=lambda m: (m[0], -len(m[1])))
+        total = magnitude = 0.0
+        end, negated_until = -1, -1
+        for start, word, payload in matches:
+            # 重叠命中取最左最长，'创新高' 不再重复计 '新高'
+            if start <= end:
+                continue
+            end = start + len(word) - 1
+            if payload == _NEGATE:
+                negated_until = end + NEGATION_SPAN
+                continue
+            if not payload:
+                continue
+            weight = -payload if start <= negated_until else payload
+            total += weight
+            magnitude += abs(weight)
+        return round(total / (magnitude + SMOOTHING), 3) if magnitude else 0.0
+
+    def score_item(self, item: Dict) -> float:
+        return self.score(item.get('title', '') + '\n' + item.get('summary', ''))
+
+    def score_items(self, items: List[Dict]) -> List[Dict]:
+        """整批打分，写入每条的 'sentiment'"""
+        for item in items:
+            item['sentiment'] = self.score_item(item)
+        return items
+
+
+def aggregate(items: Iterable[Dict], labels_of: Callable[[Dict], Iterable[str]]) -> Dict[str, Dict]:
+    """
+    按标签聚合情绪: {标签: {'score': 均值, 'count', 'positive', 'negative'}}
+    labels_of(item) 给出一条新闻所属的标签（板块、股票代码等），未打分的新闻跳过
+    """
+    buckets = defaultdict(list)
+    for item in items:
+        if item.get('sentiment') is None:
+            continue
+        for label in labels_of(item):
+            buckets[label].append(item['sentiment'])
+    return {
+        label: {
+            'score': round(sum(scores) / len(scores), 3),
+            'count': len(scores),
+            'positive': sum(s > 0 for s in scores),
+            'negative': sum(s < 0 for s in scores),
+        }
+        for label, scores in buckets.items()
+    }
+
+
+def sector_sentiment(items: Iterable[Dict], tagger) -> Dict[str, Dict]:
+    """按板块/主题聚合（tagger 为 KeywordTagger）"""
+    return aggregate(items, tagger.tag_item)
+
+
+def stock_sentiment(items: Iterable[Dict]) -> Dict[str, Dict]:
+    """按新闻提到的股票代码（'codes'）聚合"""
+    return aggregate(items, lambda item: item.get('codes', ()))
+
+
+def format_sentiment(stats: Optional[Dict]) -> str:
+    """情绪一行摘要，如: 情绪 +0.42 (5条, 利好4/利空1)"""
+    if not stats:
+        return "情绪 -"
+    return f"情绪 {stats['score']:+.2f} ({stats['count']}条, 利好{stats['positive']}/利空{stats['negative']})"
+
+
+_shared = None
+
+
+def get_scorer() -> SentimentScorer:
+    """全局共享的情绪打分器（首次调用时编译）"""
+    global _shared
+    if _shared is None:
+        _shared = SentimentScorer()
+    return _shared
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+本地新闻库 (SQLite)
+- 以规范化 URL（无URL时用标题）的哈希为主键，INSERT OR IGNORE 天然去重
+- 新浪 2516/2517 两个频道大量重复，入库后只保留一条
+- 抓取器负责写入，搜索/监控/报告从这里读取，而不是直接读网络
+- 写入时统一打情绪分、链接个股代码（在事务外算好，与新闻同一事务落库），所有写入方（抓取器、推送、回填）共用这一步
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from news_sentiment import get_scorer
+from stock_linker import get_linker
+
+NEWS_DB = '/home/node/clawd/.news_store.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS news (
+    key        TEXT PRIMARY KEY,
+    ts         INTEGER NOT NULL,
+    source     TEXT NOT NULL,
+    type       TEXT NOT NULL DEFAULT '',
+    title      TEXT NOT NULL DEFAULT '',
+    summary    TEXT NOT NULL DEFAULT '',
+    url        TEXT NOT NULL DEFAULT '',
+    media      TEXT NOT NULL DEFAULT '',
+    fetched_at INTEGER NOT NULL,
+    sentiment  REAL
+);
+CREATE INDEX IF NOT EXISTS idx_news_ts ON news(ts);
+CREATE INDEX IF NOT EXISTS idx_news_source_ts ON news(source, ts);
+CREATE TABLE IF NOT EXISTS news_symbols (
+    code TEXT NOT NULL,
+    key  TEXT NOT NULL,
+    ts   INTEGER NOT NULL,
+    PRIMARY KEY (code, key)
+);
+CREATE INDEX IF NOT EXISTS idx_news_symbols_code_ts ON news_symbols(code, ts);
+"""
+
+
+def normalize_url(url: str) -> str:
+    """去掉协议、查询参数、锚点和末尾斜杠，host 小写"""
+    parts = urlsplit(url.strip())
+    return f"{parts.netloc.lower()}{parts.path.rstrip('/')}"
+
+
+def normalize_title(title: str) -> str:
+    """去掉空白和标点，英文小写"""
+    return re.sub(r'[\s\W_]+', '', title).lower()
+
+
+def news_key(item: Dict) -> str:
+    """新闻主键: 规范化URL的哈希，无URL时用规范化标题"""
+    url = normalize_url(item.get('url', '') or '')
+    basis = f"u:{url}" if url else f"t:{normalize_title(item.get('title', ''))}"
+    return hashlib.sha1(basis.encode('utf-8')).hexdigest()[:20]
+
+
+def item_timestamp(item: Dict) -> int:
+    """新闻发布时间(epoch)：ctime > full_time > RSS pubDate > 当前时间"""
+    if item.get('ctime'):
+        return int(item['ctime'])
+    try:
+        return int(datetime.strptime(item.get('full_time', ''), '%Y-%m-%d %H:%M:%S').timestamp())
+    except ValueError:
+        pass
+    try:
+        return int(parsedate_to_datetime(item.get('time', '')).timestamp())
+    except (TypeError, ValueError):
+        return int(time.time())
+
+
+def row_to_item(row: sqlite3.Row) -> Dict:
+    """数据库行 -> 与抓取器相同格式的新闻字典"""
+    dt = datetime.fromtimestamp(row['ts'])
+    return {
+        'key': row['key'],
+        'title': row['title'],
+        'summary': row['summary'],
+        'url': row['url'],
+        'ctime': row['ts'],
+        'time': dt.strftime('%m-%d %H:%M'),
+        'full_time': dt.strftime('%Y-%m-%d %H:%M:%S'),
+        'source': row['source'],
+        'media': row['media'],
+        'type': row['type'],
+        'sentiment': row['sentiment'],
+    }
+
+
+class NewsStore:
+    """去重新闻库"""
+
+    def __init__(self, db_path: str = NEWS_DB, enrich: bool = True):
+        self.db_path = db_path
+        self.enrich = enrich  # 入库时打情绪分、链接个股（打分器/链接器首次写入时才加载，不在事务内）
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+        self.listeners = []  # 新增条目回调，用于维护内存索引等
+
+    def _migrate(self):
+        """旧库补齐新增列"""
+        columns = {row['name'] for row in self.conn.execute('PRAGMA table_info(news)')}
+        if 'media' not in columns:
+            self.conn.execute("ALTER TABLE news ADD COLUMN media TEXT NOT NULL DEFAULT ''")
+        if 'sentiment' not in columns:
+            self.conn.execute('ALTER TABLE news ADD COLUMN sentiment REAL')
+
+    def subscribe(self, callback):
+        """注册回调: callback(added_items)，每次 add_many 有新增时调用（条目已带 'sentiment'/'codes'）"""
+        self.listeners.append(callback)
+
+    def add_many(self, items: List[Dict]) -> List[Dict]:
+        """
+        批量写入（单个事务），已存在的主键直接忽略
+        返回真正新增的条目（附带 'key'），输入中的重复也只算一次
+        情绪分和个股代码在开事务之前算好，加载打分器/证券主表时不占着库锁
+        """
+        now = int(time.time())
+        rows = {}
+        for item in items:
+            key = news_key(item)
+            rows.setdefault(key, dict(item, key=key, ctime=item_timestamp(item)))
+        rows = list(rows.values())
+        if rows and self.enrich:
+            self._annotate(rows)
+
+        added = []
+        with self._lock, self.conn:
+            for item in rows:
+                cur = self.conn.execute(
+                    'INSERT OR IGNORE INTO news (key, ts, source, type, title, summary, url, media, fetched_at, sentiment) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (item['key'], item['ctime'], item.get('source', ''), item.get('type', ''),
+                     item.get('title', ''), item.get('summary', ''), item.get('url', ''),
+                     item.get('media', ''), now, item.get('sentiment')))
+                if cur.rowcount:
+                    added.append(item)
+            self._write_symbols(added)
+        if added:
+            for callback in self.listeners:
+                callback(added)
+        return added
+
+    def recent(self, limit: int = 50, source: Optional[str] = None,
+               news_type: Optional[str] = None, since: Optional[int] = None) -> List[Dict]:
+        """按发布时间倒序读取，可按来源/类型/起始时间过滤"""
+        where, args = [], []
+        if source:
+            where.append('source = ?')
+            args.append(source)
+        if news_type:
+            where.append('type = ?')
+            args.append(news_type)
+        if since is not None:
+            where.append('ts >= ?')
+            args.append(since)
+        sql = 'SELECT * FROM news'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY ts DESC LIMIT ?'
+        args.append(limit)
+        with self._lock:
+            return [row_to_item(row) for row in self.conn.execute(sql, args)]
+
+    @staticmethod
+    def _annotate(items: List[Dict]):
+        """打情绪分、链接提到的股票代码（纯计算，不碰数据库）"""
+        scorer, linker = get_scorer(), get_linker()
+        for item in items:
+            item['sentiment'] = scorer.score_item(item)
+            item['codes'] = linker.link_item(item)
+
+    def _write_symbols(self, items: List[Dict]):
+        rows = [(code, item['key'], item['ctime']) for item in items for code in item.get('codes', ())]
+        self.conn.executemany('INSERT OR IGNORE INTO news_symbols (code, key, ts) VALUES (?, ?, ?)', rows)
+
+    def _write_sentiment(self, items: List[Dict]):
+        rows = [(item['sentiment'], item['key']) for item in items if item.get('sentiment') is not None]
+        self.conn.executemany('UPDATE news SET sentiment = ? WHERE key = ?', rows)
+
+    def link_symbols(self, items: List[Dict]):
+        """把条目的 'codes'（提到的股票代码）写入 代码->新闻 索引表"""
+        with self._lock, self.conn:
+            self._write_symbols(items)
+
+    def set_sentiment(self, items: List[Dict]):
+        """批量写入条目的情绪分 'sentiment'（单个事务）"""
+        with self._lock, self.conn:
+            self._write_sentiment(items)
+
+    def enrich_pending(self, batch: int = 1000) -> int:
+        """补打分/链接统一入库流程之前写入的新闻（sentiment 为空的行），返回处理条数"""
+        done = 0
+        while True:
+            with self._lock:
+                items = [row_to_item(row) for row in self.conn.execute(
+                    'SELECT * FROM news WHERE sentiment IS NULL LIMIT ?', (batch,))]
+            if not items:
+                return done
+            self._annotate(items)
+            with self._lock, self.conn:
+                self._write_sentiment(items)
+                self._write_symbols(items)
+            done += len(items)
+
+    def symbol_sentiment(self, codes: Optional[List[str]] = None,
+                         since: Optional[int] = None) -> Dict[str, Dict]:
+        """
+        按股票代码聚合已打分新闻的情绪（库内 GROUP BY，不加载新闻正文）
+        返回 {代码: {'score': 均值, 'count', 'positive', 'negative'}}
+        """
+        sql = ('SELECT news_symbols.code AS code, AVG(news.sentiment) AS score, COUNT(*) AS count, '
+               'SUM(news.sentiment > 0) AS positive, SUM(news.sentiment < 0) AS negative '
+               'FROM news_symbols JOIN news ON news.key = news_symbols.key '
+               'WHERE news.sentiment IS NOT NULL')
+        args = []
+        if codes:
+            sql += f" AND news_symbols.code IN ({','.join('?' * len(codes))})"
+            args.extend(codes)
+        if since is not None:
+            sql += ' AND news_symbols.ts >= ?'
+            args.append(since)
+        sql += ' GROUP BY news_symbols.code'
+        with self._lock:
+            return {row['code']: {'score': round(row['score'], 3), 'count': row['count'],
+                                  'positive': row['positive'], 'negative': row['negative']}
+                    for row in self.conn.execute(sql, args)}
+
+    def news_for_symbol(self, code: str, limit: int = 5, since: Optional[int] = None) -> List[Dict]:
+        """某只股票的相关新闻（按代码索引直接定位），时间倒序"""
+        sql = ('SELECT news.* FROM news_symbols JOIN news ON news.key = news_symbols.key '
+               'WHERE news_symbols.code = ?')
+        args = [code]
+        if since is not None:
+            sql += ' AND news_symbols.ts >= ?'
+            args.append(since)
+        sql += ' ORDER BY news_symbols.ts DESC LIMIT ?'
+        args.append(limit)
+        with self._lock:
+            return [row_to_item(row) for row in self.conn.execute(sql, args)]
+
+    def contains(self, item: Dict) -> bool:
+        """该新闻是否已入库"""
+        with self._lock:
+            return self.conn.execute('SELECT 1 FROM news WHERE key = ?',
+                                     (news_key(item),)).fetchone() is not None
+
+    def count(self) -> int:
+        with self._lock:
+            return self.conn.execute('SELECT COUNT(*) FROM news').fetchone()[0]
+
+    def close(self):
+        self.conn.close()
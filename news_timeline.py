@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+新闻时间线
+发布时间在入库时就是整数epoch (ctime)，这里按时间维护一个有序数组，
+"最近N小时"、与行情数据按时间窗口对齐都变成二分查找切片，不再逐条解析时间字符串
+"""
+
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TIMELINE_WINDOW = 5000  # 启动时从新闻库载入的最近条数
+
+
+class NewsTimeline:
+    """按发布时间排序的新闻数组"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.times: List[int] = []
+        self.items: List[Dict] = []
+        self.keys = set()
+
+    @classmethod
+    def from_store(cls, store, window: int = TIMELINE_WINDOW) -> 'NewsTimeline':
+        timeline = cls()
+        timeline.add(reversed(store.recent(window)))
+        return timeline
+
+    def add(self, items: Iterable[Dict]):
+        """加入新闻（需带整数 'ctime'），新新闻基本都落在末尾，插入开销很小"""
+        with self._lock:
+            for item in items:
+                key = item.get('key')
+                if not item.get('ctime') or (key and key in self.keys):
+                    continue
+                if key:
+                    self.keys.add(key)
+                ts = int(item['ctime'])
+                if not self.times or ts >= self.times[-1]:
+                    self.times.append(ts)
+                    self.items.append(item)
+                else:
+                    pos = bisect_right(self.times, ts)
+                    self.times.insert(pos, ts)
+                    self.items.insert(pos, item)
+
+    def window(self, start: int, end: Optional[int] = None) -> List[Dict]:
+        """发布时间在 [start, end] 内的新闻，时间倒序"""
+        with self._lock:
+            lo = bisect_left(self.times, start)
+            hi = len(self.times) if end is None else bisect_right(self.times, end)
+            return self.items[lo:hi][::-1]
+
+    def last_hours(self, hours: float, now: Optional[float] = None) -> List[Dict]:
+        """最近N小时的新闻，时间倒序"""
+        now = time.time() if now is None else now
+        return self.window(int(now - hours * 3600))
+
+    def around(self, ts: int, before: int = 1800, after: int = 0) -> List[Dict]:
+        """某个时点（如行情异动）之前 before 秒到之后 after 秒的新闻"""
+        return self.window(ts - before, ts + after)
+
+    def join(self, points: Iterable[Tuple[int, Dict]], before: int = 1800,
+             after: int = 0) -> List[Tuple[Dict, List[Dict]]]:
+        """行情序列 [(epoch, 行情)] 逐点对齐时间窗口内的新闻"""
+        return [(point, self.around(ts, before, after)) for ts, point in points]
+
+    def __len__(self):
+        return len(self.times)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+新浪滚动新闻接口 (feed.mix.sina.com.cn/api/roll/get)
+- 单页抓取与字段解析
+- 按 ctime 高水位的增量抓取：只翻页到已见过的新闻为止
+- 各抓取器共用的 并发抓取 -> 推进水位 -> 写入新闻库 流程
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from news_concurrent import fetch_concurrently, DEFAULT_DEADLINE
+from news_store import item_timestamp, news_key
+
+SINA_ROLL_URL = "https://feed.mix.sina.com.cn/api/roll/get"
+
+# 源名称 -> lid
+SINA_LIDS = {
+    '新浪财经': '2516',
+    '新浪股票': '2517',
+}
+
+WATERMARK_FILE = '/home/node/clawd/.news_watermark.json'
+
+SINA_TTL = 60  # HTTP缓存新鲜期（秒），同一次报告内的重复调用只请求一次
+
+
+def parse_sina_item(item: Dict, source: str) -> Dict:
+    """把接口原始条目转换成统一新闻格式"""
+    ctime = int(item.get('ctime', 0) or 0)
+    dt = datetime.fromtimestamp(ctime) if ctime else datetime.now()
+    return {
+        'id': item.get('docid') or item.get('wapurl') or item.get('url', ''),
+        'title': item.get('title', ''),
+        'summary': item.get('intro', '')[:150],
+        'url': item.get('wapurl', ''),
+        'ctime': ctime,
+        'time': dt.strftime('%m-%d %H:%M'),
+        'full_time': dt.strftime('%Y-%m-%d %H:%M:%S'),
+        'source': source,
+        'media': item.get('media_name', ''),
+        'type': 'a_stock'
+    }
+
+
+def fetch_sina_page(session, source: str, num: int = 20, page: int = 1,
+                    timeout: int = 10, cache=None, ttl: float = SINA_TTL) -> List[Dict]:
+    """
+    抓取指定源的一页新闻（按时间倒序），失败时抛异常
+    传入 cache (HttpCache) 时走磁盘缓存和条件请求
+    """
+    params = {"pageid": "153", "lid": SINA_LIDS[source], "num": num,
+              "page": str(page), "encode": "utf-8"}
+    if cache is not None:
+        resp = cache.get(session, SINA_ROLL_URL, params=params, ttl=ttl, timeout=timeout)
+    else:
+        resp = session.get(SINA_ROLL_URL, params=params, timeout=timeout)
+    data = resp.json()
+    return [parse_sina_item(item, source)
+            for item in data.get('result', {}).get('data', [])]
+
+
+class WatermarkStore:
+    """
+    各新闻源的高水位记录（持久化到JSON）
+    格式: {源名称: {'ctime': 最新ctime, 'ids': [该ctime下已见过的id]}}
+    同一秒可能有多条新闻，所以除ctime外还要记住该秒内的id
+    """
+
+    def __init__(self, path: str = WATERMARK_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.marks = self._load()
+
+    def _load(self) -> Dict:
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    return json.load(f)
+            except Exception:
+                pass
+        return {}
+
+    def save(self):
+        """原子写入，避免并发任务读到半个文件"""
+        with self._lock:
+            tmp = f"{self.path}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(self.marks, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+
+    def get(self, source: str) -> Optional[Dict]:
+        return self.marks.get(source)
+
+    def is_new(self, source: str, item: Dict) -> bool:
+        mark = self.marks.get(source)
+        if not mark:
+            return True
+        if item['ctime'] != mark['ctime']:
+            return item['ctime'] > mark['ctime']
+        return item['id'] not in mark['ids']
+
+    def advance(self, source: str, items: List[Dict]):
+        """用新抓到的条目推进水位"""
+        if not items:
+            return
+        with self._lock:
+            mark = self.marks.get(source) or {'ctime': 0, 'ids': []}
+            top = max(item['ctime'] for item in items)
+            if top > mark['ctime']:
+                mark = {'ctime': top, 'ids': []}
+            if top == mark['ctime']:
+                seen = set(mark['ids'])
+                seen.update(item['id'] for item in items if item['ctime'] == top)
+                mark['ids'] = sorted(seen)
+            self.marks[source] = mark
+
+
+def poll_sina_new(session, source: str, watermarks: WatermarkStore,
+                  page_size: int = 20, max_pages: int = 10,
+                  cache=None, ttl: float = SINA_TTL) -> List[Dict]:
+    """
+    增量抓取：从第1页开始往后翻，遇到已见过的新闻即停止
+    首次运行（没有水位）只取第1页作为起点
+    返回本次新出现的新闻（时间倒序）
+    不在这里推进水位：调用方确认收下结果后再 advance + save，超时丢弃的结果下次还会再抓到
+    """
+    new_items = []
+    first_run = watermarks.get(source) is None
+
+    for page in range(1, max_pages + 1):
+        items = fetch_sina_page(session, source, num=page_size, page=page, cache=cache, ttl=ttl)
+        fresh = [item for item in items if watermarks.is_new(source, item)]
+        new_items.extend(fresh)
+
+        # 本页出现旧新闻 / 已到末页 / 首次运行，都不必继续翻页
+        if first_run or len(fresh) < len(items) or len(items) < page_size:
+            break
+
+    return new_items
+
+
+def refresh_sina(session, watermarks: WatermarkStore, store, page_size: int = 20,
+                 deadline: float = DEFAULT_DEADLINE, cache=None, ttl: float = SINA_TTL,
+                 extra_tasks: Optional[Dict[str, Callable[[], List[Dict]]]] = None
+                 ) -> Tuple[List[Dict], List[Dict], Dict[str, Dict]]:
+    """
+    并发增量抓取新浪各源（可附带其它源的抓取任务），推进并保存水位，结果写入新闻库
+    返回 (fetched, added, timing)
+    fetched: 本次越过本进程水位抓到的条目（带 'key'，两个频道重复的只保留一条），
+             其它进程可能已先写入新闻库，所以不一定都在 added 里
+    added:   新闻库中真正新增的条目
+    timing:  各源耗时
+    """
+    tasks = {
+        source: (lambda s=source: poll_sina_new(session, s, watermarks, page_size, cache=cache, ttl=ttl))
+        for source in SINA_LIDS
+    }
+    tasks.update(extra_tasks or {})
+    results, timing = fetch_concurrently(tasks, deadline)
+    for source in SINA_LIDS:
+        watermarks.advance(source, results.get(source, []))
+    watermarks.save()
+
+    fetched = {}
+    for source in tasks:
+        for item in results.get(source, []):
+            key = news_key(item)
+            fetched.setdefault(key, dict(item, key=key, ctime=item_timestamp(item)))
+    fetched = list(fetched.values())
+    return fetched, store.add_many(fetched), timing
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+新闻-个股实体链接
+- 证券主表（代码、名称、简称、别名）编译成一个 Aho–Corasick 自动机
+- 每条新闻一次扫描得到提到的全部股票代码，写入新闻库的 代码->新闻 索引表
+- 个股异动时按代码直接取相关新闻，不必再全文搜索
+"""
+
+import json
+import os
+import time
+from typing import Dict, Iterable, List
+
+from keyword_tagger import AhoCorasick
+
+SYMBOL_MASTER_FILE = '/home/node/clawd/.symbol_master.json'
+MASTER_MAX_AGE = 24 * 3600  # 全市场主表每天刷新一次
+
+# 关注标的（主表下载失败时也能识别），别名用于新闻里的常见叫法
+WATCHED_SYMBOLS = [
+    {'code': '688256', 'name': '寒武纪', 'short': '寒武纪', 'aliases': ['寒武纪-U']},
+    {'code': '600519', 'name': '贵州茅台', 'short': '茅台', 'aliases': []},
+    {'code': '000001', 'name': '平安银行', 'short': '平安银行', 'aliases': []},
+    {'code': '688008', 'name': '澜起科技', 'short': '澜起', 'aliases': []},
+    {'code': '301308', 'name': '江波龙', 'short': '江波龙', 'aliases': []},
+]
+
+
+def load_symbol_master(path: str = SYMBOL_MASTER_FILE) -> List[Dict]:
+    """
+    全市场A股主表（akshare），本地缓存一天
+    akshare 不可用或下载失败时用旧缓存，再不行只用关注标的
+    """
+    cached = []
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                cached = json.load(f)
+            if time.time() - os.path.getmtime(path) < MASTER_MAX_AGE:
+                return cached
+        except Exception:
+            cached = []
+
+    try:
+        import akshare as ak
+        df = ak.stock_info_a_code_name()
+        master = [{'code': str(code), 'name': str(name).replace(' ', ''), 'short': '', 'aliases': []}
+                  for code, name in zip(df['code'], df['name'])]
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(master, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        return master
+    except Exception as e:
+        print(f"[警告] 证券主表更新失败，使用缓存: {e}")
+        return cached
+
+
+class StockLinker:
+    """股票名称/代码自动机"""
+
+    def __init__(self, symbols: Iterable[Dict]):
+        patterns = {}
+        for sym in symbols:
+            for word in [sym['code'], sym.get('name', ''), sym.get('short', '')] + list(sym.get('aliases', [])):
+                # 单字名称误报太多，不参与匹配
+                if word and len(word) >= 2:
+                    patterns.setdefault(word, sym['code'])
+        self.automaton = AhoCorasick(patterns.items())
+
+    def link(self, text: str) -> List[str]:
+        """
+        文本中提到的股票代码（按出现顺序去重）
+        重叠命中取最左最长，避免 '平安银行' 里再命中 '平安'
+        """
+        matches = sorted(self.automaton.iter_matches(text), key=lambda m: (m[0], -len(m[1])))
+        codes, end = [], -1
+        for start, word, code in matches:
+            if start <= end:
+                continue
+            end = start + len(word) - 1
+            if code not in codes:
+                codes.append(code)
+        return codes
+
+    def link_item(self, item: Dict) -> List[str]:
+        return self.link(item.get('title', '') + '\n' + item.get('summary', ''))
+
+
+_shared = None
+
+
+def get_linker() -> StockLinker:
+    """全局共享的实体链接器（关注标的 + 全市场主表，首次调用时编译）"""
+    global _shared
+    if _shared is None:
+        _shared = StockLinker(WATCHED_SYMBOLS + load_symbol_master())
+    return _shared
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Tavily 响应缓存 (SQLite)
+- 键: 规范化查询 + search_depth + max_results + include_answer
+- 按查询类别设置有效期，同一查询在有效期内不再消耗月度额度
+- 多个定时任务共用一个缓存文件，命中/未命中次数累计在库里
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+TAVILY_CACHE_DB = '/home/node/clawd/.tavily_cache.db'
+
+# 查询类别 -> 有效期（秒）
+TAVILY_TTL = {
+    'market': 30 * 60,       # 美股/加密盘面，半小时内视为同一结果
+    'report': 3 * 3600,      # 早晚报固定查询
+    'company': 6 * 3600,     # 个股深度
+    'default': 3600,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key        TEXT PRIMARY KEY,
+    query      TEXT NOT NULL,
+    response   TEXT NOT NULL,
+    fetched_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stats (
+    name  TEXT PRIMARY KEY,
+    count INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def normalize_query(query: str) -> str:
+    """小写、合并空白，'Fed  Rate ' 与 'fed rate' 视为同一查询"""
+    return re.sub(r'\s+', ' ', query).strip().lower()
+
+
+def cache_key(query: str, search_depth: str, max_results: int, include_answer: bool) -> str:
+    basis = f"{normalize_query(query)}|{search_depth}|{max_results}|{int(bool(include_answer))}"
+    return hashlib.sha1(basis.encode('utf-8')).hexdigest()[:20]
+
+
+class TavilyCache:
+    """Tavily 响应缓存"""
+
+    def __init__(self, db_path: str = TAVILY_CACHE_DB, ttl: Optional[Dict[str, int]] = None):
+        self.ttl = dict(TAVILY_TTL, **(ttl or {}))
+        self.stats = {'hit': 0, 'miss': 0}  # 本进程
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+
+    def _count(self, name: str):
+        self.stats[name] += 1
+        with self.conn:
+            self.conn.execute('INSERT INTO stats (name, count) VALUES (?, 1) '
+                              'ON CONFLICT(name) DO UPDATE SET count = count + 1', (name,))
+
+    def get(self, key: str, query_class: str = 'default', stale_ok: bool = False,
+            count: bool = True) -> Optional[Dict]:
+        """
+        有效期内的缓存响应，过期或不存在返回 None
+        stale_ok: 额度不足时允许返回过期响应
+        count: 是否计入命中/未命中；一次搜索要查多个键时传 False，由调用方 record 一次
+        """
+        max_age = float('inf') if stale_ok else self.ttl.get(query_class, self.ttl['default'])
+        with self._lock:
+            row = self.conn.execute('SELECT response, fetched_at FROM responses WHERE key = ?',
+                                    (key,)).fetchone()
+            found = row is not None and time.time() - row[1] < max_age
+            if count:
+                self._count('hit' if found else 'miss')
+            return dict(json.loads(row[0]), cached_at=row[1]) if found else None
+
+    def record(self, hit: bool):
+        """计一次命中/未命中（配合 get(count=False)）"""
+        with self._lock:
+            self._count('hit' if hit else 'miss')
+
+    def put(self, key: str, query: str, response: Dict):
+        with self._lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO responses (key, query, response, fetched_at) VALUES (?, ?, ?, ?)',
+                (key, query, json.dumps(response, ensure_ascii=False), int(time.time())))
+
+    def purge(self, max_age: Optional[int] = None) -> int:
+        """删除超过最长有效期的条目，返回删除条数"""
+        max_age = max(self.ttl.values()) if max_age is None else max_age
+        with self._lock, self.conn:
+            return self.conn.execute('DELETE FROM responses WHERE fetched_at < ?',
+                                     (int(time.time()) - max_age,)).rowcount
+
+    def summary(self) -> Dict:
+        """累计命中统计: {'hit', 'miss', 'hit_rate', 'entries'}"""
+        with self._lock:
+            totals = dict(self.conn.execute('SELECT name, count FROM stats').fetchall())
+            entries = self.conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        hit, miss = totals.get('hit', 0), totals.get('miss', 0)
+        return {
+            'hit': hit,
+            'miss': miss,
+            'hit_rate': round(hit / (hit + miss), 3) if hit + miss else 0.0,
+            'entries': entries,
+        }
+
+    def close(self):
+        self.conn.close()
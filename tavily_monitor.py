@@ -2,93 +2,227 @@
 """
 Tavily API 额度监控
 每月1000次免费额度管理
+- 额度按 credit 计: basic 搜索 1 个，advanced 搜索 2 个
+- 预算规划: 剩余额度按本月剩余交易日分配，先给定时任务留足，超预算时降级或走缓存
+- 交易日历来自 akshare（新浪交易日历），本地缓存，下载失败时退回 周一至周五
 """
 
 import os
 import json
-from datetime import datetime, timedelta
+import sqlite3
+import calendar
+import threading
+import time
+from datetime import datetime, timedelta, date
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 API_LIMIT = 1000  # 每月免费额度
-USAGE_FILE = '/home/node/clawd/.tavily_usage.json'
+USAGE_DB = '/home/node/clawd/.tavily_usage.db'
+USAGE_FILE = '/home/node/clawd/.tavily_usage.json'  # 旧版记录，首次运行时导入数据库
+TRADE_CALENDAR_FILE = '/home/node/clawd/.trade_calendar.json'
+CALENDAR_MAX_AGE = 30 * 86400  # 交易日历每月刷新一次（年底公布次年日历）
+
+USAGE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_usage (
+    day     TEXT PRIMARY KEY,
+    credits INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS monthly_usage (
+    month   TEXT PRIMARY KEY,
+    credits INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS job_usage (
+    day     TEXT NOT NULL,
+    job     TEXT NOT NULL,
+    credits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, job)
+);
+"""
+
+SEARCH_COST = {'basic': 1, 'advanced': 2}  # 每次搜索消耗的 credit
+
+# 定时任务: 任务 -> 运行时刻(小时)、每次调用数、搜索深度
+SCHEDULED_JOBS = {
+    'morning': {'hour': 7, 'calls': 1, 'depth': 'advanced'},
+    'evening': {'hour': 19, 'calls': 1, 'depth': 'advanced'},
+}
+ADHOC_RESERVE = 0.2  # 日预算中留给临时搜索的比例
+
+
+def load_trade_calendar(path: str = TRADE_CALENDAR_FILE) -> List[str]:
+    """
+    A股交易日列表 ['YYYY-MM-DD', ...]（akshare 新浪交易日历），本地缓存一个月
+    缓存已不覆盖今天时提前刷新；下载失败用旧缓存，再不行返回空列表（按周一至周五算）
+    """
+    cached = []
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                cached = json.load(f)
+            fresh = time.time() - os.path.getmtime(path) < CALENDAR_MAX_AGE
+            if cached and fresh and cached[-1] >= date.today().isoformat():
+                return cached
+        except Exception:
+            cached = []
+
+    try:
+        import akshare as ak
+        df = ak.tool_trade_date_hist_sina()
+        days = sorted(str(d)[:10] for d in df['trade_date'])
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(days, f)
+        os.replace(tmp, path)
+        return days
+    except Exception as e:
+        print(f"[警告] 交易日历更新失败，使用缓存: {e}")
+        return cached
+
+
+_calendar = None
+
+
+def trade_calendar() -> Tuple[frozenset, str]:
+    """(交易日集合, 日历覆盖到的最后一天)，进程内只加载一次"""
+    global _calendar
+    if _calendar is None:
+        days = load_trade_calendar()
+        _calendar = (frozenset(days), days[-1] if days else '')
+    return _calendar
+
+
+def days_in_month(day: date) -> int:
+    return calendar.monthrange(day.year, day.month)[1]
+
+
+def is_trading_day(day: date) -> bool:
+    """按交易日历判断（含国庆、春节等休市）；日历未覆盖的日期退回 周一至周五"""
+    days, last = trade_calendar()
+    key = day.isoformat()
+    if days and key <= last:
+        return key in days
+    return day.weekday() < 5
+
+
+def trading_days_left(today: date) -> int:
+    """本月从今天(含)起的剩余交易日数"""
+    last = days_in_month(today)
+    return sum(is_trading_day(today.replace(day=d)) for d in range(today.day, last + 1))
+
 
 class TavilyMonitor:
-    """Tavily额度监控器"""
+    """
+    Tavily额度监控器
+    用量记在 SQLite 里，每次记账是一条 UPSERT（原子、带锁），并行的报告任务不会丢计数；
+    往月的按日计数在换月时压缩成一行月度合计
+    """
     
-    def __init__(self):
-        self.usage_data = self._load_usage()
+    def __init__(self, db_path: str = USAGE_DB):
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')  # WAL 下仍保证一致性，记账不必每次 fsync
+        self.conn.executescript(USAGE_SCHEMA)
+        self._migrate_json()
     
-    def _load_usage(self) -> dict:
-        """加载使用记录"""
-        if os.path.exists(USAGE_FILE):
+    def _migrate_json(self):
+        """旧版 .tavily_usage.json 导入数据库（只导入一次，原文件改名保留）"""
+        if not os.path.exists(USAGE_FILE):
+            return
+        try:
             with open(USAGE_FILE, 'r') as f:
-                return json.load(f)
-        return {
-            'month': datetime.now().strftime('%Y-%m'),
-            'calls': 0,
-            'daily_usage': {},
-            'last_reset': datetime.now().isoformat()
-        }
-    
-    def _save_usage(self):
-        """保存使用记录"""
-        with open(USAGE_FILE, 'w') as f:
-            json.dump(self.usage_data, f, indent=2)
+                data = json.load(f)
+            daily = data.get('daily_usage', {})
+            # 早期记录可能只有月度总数，差额记到当月1号
+            untracked = data.get('calls', 0) - sum(v for d, v in daily.items() if d.startswith(data['month']))
+            if untracked > 0:
+                first = f"{data['month']}-01"
+                daily[first] = daily.get(first, 0) + untracked
+            with self.conn:
+                self.conn.executemany(
+                    'INSERT INTO daily_usage (day, credits) VALUES (?, ?) '
+                    'ON CONFLICT(day) DO UPDATE SET credits = credits + excluded.credits',
+                    daily.items())
+            os.replace(USAGE_FILE, f"{USAGE_FILE}.migrated")
+            print(f"📦 已导入旧用量记录: {data.get('calls', 0)}次")
+        except Exception as e:
+            print(f"[警告] 旧用量记录导入失败: {e}")
     
     def check_and_reset(self):
-        """检查是否需要重置月度额度"""
-        current_month = datetime.now().strftime('%Y-%m')
-        if self.usage_data['month'] != current_month:
-            print(f"🔄 新月度额度重置: {current_month}")
-            self.usage_data = {
-                'month': current_month,
-                'calls': 0,
-                'daily_usage': {},
-                'last_reset': datetime.now().isoformat()
-            }
-            self._save_usage()
+        """换月后把往月按日计数压缩为月度合计（月度额度按当月计数自然重置）"""
+        month_start = datetime.now().strftime('%Y-%m-01')
+        with self._lock, self.conn:
+            compacted = self.conn.execute(
+                'INSERT INTO monthly_usage (month, credits) '
+                'SELECT substr(day, 1, 7), SUM(credits) FROM daily_usage WHERE day < ? GROUP BY substr(day, 1, 7) '
+                'ON CONFLICT(month) DO UPDATE SET credits = credits + excluded.credits',
+                (month_start,)).rowcount
+            if compacted:
+                self.conn.execute('DELETE FROM daily_usage WHERE day < ?', (month_start,))
+                self.conn.execute('DELETE FROM job_usage WHERE day < ?', (month_start,))
+                print(f"🔄 新月度额度重置: {month_start[:7]}")
     
-    def record_call(self, purpose: str = ""):
-        """记录一次API调用"""
-        self.check_and_reset()
-        
-        self.usage_data['calls'] += 1
-        
+    def record_call(self, purpose: str = "", credits: int = 1, job: Optional[str] = None):
+        """记录一次API调用（按 credit 累计），返回本月累计；job 为定时任务名时另记该任务今日用量"""
         today = datetime.now().strftime('%Y-%m-%d')
-        if today not in self.usage_data['daily_usage']:
-            self.usage_data['daily_usage'][today] = 0
-        self.usage_data['daily_usage'][today] += 1
-        
-        self._save_usage()
-        return self.usage_data['calls']
+        with self._lock, self.conn:
+            self.conn.execute(
+                'INSERT INTO daily_usage (day, credits) VALUES (?, ?) '
+                'ON CONFLICT(day) DO UPDATE SET credits = credits + excluded.credits',
+                (today, credits))
+            if job in SCHEDULED_JOBS:
+                self.conn.execute(
+                    'INSERT INTO job_usage (day, job, credits) VALUES (?, ?, ?) '
+                    'ON CONFLICT(day, job) DO UPDATE SET credits = credits + excluded.credits',
+                    (today, job, credits))
+        return self.month_used()
+    
+    def month_used(self) -> int:
+        """本月已用 credit"""
+        month_start = datetime.now().strftime('%Y-%m-01')
+        with self._lock:
+            return self.conn.execute('SELECT COALESCE(SUM(credits), 0) FROM daily_usage WHERE day >= ?',
+                                     (month_start,)).fetchone()[0]
+    
+    def day_used(self, day: str = None) -> int:
+        """某天已用 credit（默认今天）"""
+        day = day or datetime.now().strftime('%Y-%m-%d')
+        with self._lock:
+            row = self.conn.execute('SELECT credits FROM daily_usage WHERE day = ?', (day,)).fetchone()
+        return row[0] if row else 0
+    
+    def jobs_used(self, day: str = None) -> Dict[str, int]:
+        """各定时任务某天已用 credit（默认今天）"""
+        day = day or datetime.now().strftime('%Y-%m-%d')
+        with self._lock:
+            return dict(self.conn.execute('SELECT job, credits FROM job_usage WHERE day = ?', (day,)).fetchall())
     
     def get_status(self) -> dict:
         """获取额度状态"""
         self.check_and_reset()
         
-        used = self.usage_data['calls']
+        used = self.month_used()
         remaining = API_LIMIT - used
         percentage = (used / API_LIMIT) * 100
         
-        today = datetime.now().strftime('%Y-%m-%d')
-        today_calls = self.usage_data['daily_usage'].get(today, 0)
+        today_calls = self.day_used()
         
-        # 计算预估
-        days_in_month = 30  # 简化计算
-        day_of_month = datetime.now().day
-        if day_of_month > 1:
-            daily_avg = used / day_of_month
-            projected = daily_avg * days_in_month
-        else:
-            projected = used
+        # 按本月实际天数预估
+        now = datetime.now()
+        month_days = days_in_month(now.date())
+        elapsed = now.day - 1 + now.hour / 24
+        projected = used / elapsed * month_days if elapsed >= 1 else used
         
         return {
-            'month': self.usage_data['month'],
+            'month': now.strftime('%Y-%m'),
             'used': used,
             'remaining': remaining,
             'percentage': round(percentage, 1),
             'today_calls': today_calls,
             'projected_monthly': round(projected),
+            'days_left': month_days - now.day + 1,
+            'trading_days_left': trading_days_left(now.date()),
             'status': 'ok' if remaining > 100 else 'warning' if remaining > 20 else 'critical'
         }
     
@@ -114,27 +248,92 @@ class TavilyMonitor:
             print("🚨 额度严重不足！")
         
         # 使用建议
-        remaining = status['remaining']
-        days_left = 30 - datetime.now().day
-        if days_left > 0:
-            daily_allowance = remaining // days_left
-            print(f"建议: 剩余{days_left}天，每天可用约{daily_allowance}次")
+        plan = TavilyBudget(self).plan()
+        print(f"建议: 本月剩余{status['days_left']}天 / {plan['trading_days_left']}个交易日，"
+              f"每个交易日约{plan['daily_budget']:.0f}次，今日还可用{plan['today_available']:.0f}次")
         
         print("=" * 50)
 
 
-def check_before_report() -> bool:
+class TavilyBudget:
+    """
+    月度额度规划
+    日预算 = 剩余额度 / 本月剩余交易日；今天还没跑完的定时任务先预留，
+    临时搜索只能用预留之外的部分。超预算时 advanced 降级为 basic，再不够就走缓存
+    """
+
+    def __init__(self, monitor: Optional[TavilyMonitor] = None):
+        self.monitor = monitor or TavilyMonitor()
+
+    def plan(self, now: Optional[datetime] = None) -> Dict:
+        """今日预算: {'remaining', 'trading_days_left', 'daily_budget', 'today_used', 'scheduled_reserve', 'today_available'}"""
+        now = now or datetime.now()
+        status = self.monitor.get_status()
+        days = max(1, trading_days_left(now.date()))
+        # 今天已用的 credit 也属于今天的预算
+        daily_budget = (status['remaining'] + status['today_calls']) / days
+        reserve = 0
+        if is_trading_day(now.date()):
+            # 还没到点或正在跑的任务，扣掉它今天已经花掉的部分（已跑完的不再重复预留）
+            used = self.monitor.jobs_used(now.strftime('%Y-%m-%d'))
+            reserve = sum(max(0, job['calls'] * SEARCH_COST[job['depth']] - used.get(name, 0))
+                          for name, job in SCHEDULED_JOBS.items() if job['hour'] >= now.hour)
+        return {
+            'remaining': status['remaining'],
+            'trading_days_left': days,
+            'daily_budget': round(daily_budget, 1),
+            'today_used': status['today_calls'],
+            'scheduled_reserve': reserve,
+            'today_available': max(0.0, daily_budget - status['today_calls']),
+        }
+
+    def decide(self, search_depth: str = 'basic', job: str = 'adhoc',
+               now: Optional[datetime] = None) -> Dict:
+        """
+        单次调用的预算决策:
+        {'action': 'search' / 'downgrade' / 'cache', 'depth', 'cost', 'reason'}
+        定时任务可以动用自己的预留；额度耗尽时只能走缓存
+        """
+        plan = self.plan(now)
+        available = plan['today_available']
+        if job not in SCHEDULED_JOBS:
+            available -= plan['scheduled_reserve']
+        available = max(0.0, min(available, plan['remaining']))
+
+        cost = SEARCH_COST.get(search_depth, 1)
+        if cost <= available:
+            return {'action': 'search', 'depth': search_depth, 'cost': cost,
+                    'reason': f"今日可用 {available:.1f}"}
+        if search_depth != 'basic' and SEARCH_COST['basic'] <= available:
+            return {'action': 'downgrade', 'depth': 'basic', 'cost': SEARCH_COST['basic'],
+                    'reason': f"今日可用 {available:.1f}，不足 {cost}，降级为 basic"}
+        # 月末最后的余量不再按日均分，定时任务仍可用完
+        if job in SCHEDULED_JOBS and SEARCH_COST['basic'] <= plan['remaining']:
+            depth = search_depth if cost <= plan['remaining'] else 'basic'
+            return {'action': 'search' if depth == search_depth else 'downgrade', 'depth': depth,
+                    'cost': SEARCH_COST[depth], 'reason': f"定时任务超出日预算，剩余 {plan['remaining']}"}
+        return {'action': 'cache', 'depth': search_depth, 'cost': 0,
+                'reason': f"今日可用 {available:.1f}，超出预算，仅用缓存"}
+
+
+def check_before_report(job: str = None, monitor: Optional[TavilyMonitor] = None) -> bool:
     """
     生成报告前检查额度
+    monitor: 调用方实际使用的用量库（如指向替身服务时的 .stub 库），默认真实用量库
     返回: True可以生成, False额度不足
     """
-    monitor = TavilyMonitor()
+    monitor = monitor or TavilyMonitor()
     status = monitor.get_status()
     
-    if status['remaining'] < 2:
-        print(f"🚨 API额度不足！剩余{status['remaining']}次，至少需要2次")
+    if status['remaining'] < SEARCH_COST['basic']:
+        print(f"🚨 API额度不足！剩余{status['remaining']}次，至少需要{SEARCH_COST['basic']}次")
         return False
     
+    if job:
+        decision = TavilyBudget(monitor).decide('advanced', job=job)
+        if decision['action'] != 'search':
+            print(f"⚠️  预算: {decision['reason']}")
+    
     if status['remaining'] < 10:
         print(f"⚠️  API额度紧张，剩余{status['remaining']}次")
     
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+本地 Tavily 替身服务 (api.tavily.com/search)
+- replay: 回放录制的响应，不消耗额度；没录过的查询返回合成结果
+- record: 转发到真实 API 并把响应录下来（消耗额度，需要 TAVILY_API_KEY）
+- 可配置延迟、错误注入，用于离线测报告生成吞吐和缓存效果
+- GET /stats 查看请求计数
+
+用法:
+    python3 tavily_stub.py --mode record                       # 录制
+    python3 tavily_stub.py --latency 800 --jitter 300 --error-rate 0.1
+    TAVILY_API_URL=http://127.0.0.1:8765/search TAVILY_API_KEY=dummy python3 news_reporter.py morning
+"""
+
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from tavily_cache import cache_key, normalize_query
+
+RECORDINGS_DIR = '/home/node/clawd/.tavily_recordings'
+REAL_API_URL = "https://api.tavily.com/search"
+
+
+class TavilyStub:
+    """录制/回放存储 + 注入策略"""
+
+    def __init__(self, recordings_dir: str = RECORDINGS_DIR, mode: str = 'replay',
+                 latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 500):
+        self.recordings_dir = recordings_dir
+        self.mode = mode
+        self.latency = latency / 1000
+        self.jitter = jitter / 1000
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.api_key = os.getenv('TAVILY_API_KEY')
+        self.session = requests.Session()
+        self.stats = {'requests': 0, 'replayed': 0, 'synthetic': 0, 'recorded': 0, 'errors': 0}
+        self._lock = threading.Lock()
+        os.makedirs(recordings_dir, exist_ok=True)
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _path(self, body: Dict) -> str:
+        """录制文件按与 Tavily 缓存相同的键命名"""
+        key = cache_key(body.get('query', ''), body.get('search_depth', 'basic'),
+                        body.get('max_results', 5), body.get('include_answer', False))
+        return os.path.join(self.recordings_dir, f"{key}.json")
+
+    def _load(self, body: Dict) -> Optional[Dict]:
+        path = self._path(body)
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                return json.load(f)['response']
+        return None
+
+    def _save(self, body: Dict, response: Dict):
+        path = self._path(body)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'request': body, 'response': response}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def synthetic(body: Dict) -> Dict:
+        """没录过的查询: 按请求参数生成结构一致的结果"""
+        query = body.get('query', '')
+        results = [{
+            'title': f"[stub] {query} #{i + 1}",
+            'url': f"https://stub.local/{i + 1}",
+            'content': f"Synthetic result {i + 1} for '{normalize_query(query)}'",
+            'score': round(1 - i * 0.05, 2),
+        } for i in range(int(body.get('max_results', 5)))]
+        response = {'query': query, 'results': results, 'response_time': 0.0}
+        if body.get('include_answer'):
+            response['answer'] = f"[stub] summary for '{query}'"
+        return response
+
+    def handle(self, body: Dict, headers: Dict) -> Tuple[int, Dict]:
+        """返回 (状态码, 响应体)"""
+        self._count('requests')
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, random.gauss(self.latency, self.jitter)))
+        if self.error_rate and random.random() < self.error_rate:
+            self._count('errors')
+            return self.error_status, {'detail': {'error': 'injected error'}}
+
+        if self.mode == 'record':
+            resp = self.session.post(REAL_API_URL, json=body, timeout=30,
+                                     headers={'Authorization': f"Bearer {self.api_key}"})
+            if resp.status_code != 200:
+                return resp.status_code, {'detail': resp.text[:500]}
+            self._save(body, resp.json())
+            self._count('recorded')
+            return 200, resp.json()
+
+        recorded = self._load(body)
+        if recorded is not None:
+            self._count('replayed')
+            return 200, recorded
+        self._count('synthetic')
+        return 200, self.synthetic(body)
+
+
+def make_handler(stub: TavilyStub):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status: int, payload: Dict):
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if self.path.rstrip('/') != '/search':
+                return self._reply(404, {'detail': 'not found'})
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                return self._reply(400, {'detail': 'invalid json'})
+            try:
+                status, payload = stub.handle(body, dict(self.headers))
+            except Exception as e:
+                status, payload = 502, {'detail': str(e)}
+            self._reply(status, payload)
+
+        def do_GET(self):
+            if self.path.rstrip('/') == '/stats':
+                return self._reply(200, stub.stats)
+            self._reply(404, {'detail': 'not found'})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(stub: TavilyStub, host: str = '127.0.0.1', port: int = 8765) -> ThreadingHTTPServer:
+    """创建服务（调用方 serve_forever 或放到线程里跑）"""
+    return ThreadingHTTPServer((host, port), make_handler(stub))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地 Tavily 替身服务')
+    parser.add_argument('--mode', choices=['replay', 'record'], default='replay')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--dir', default=RECORDINGS_DIR, help='录制文件目录')
+    parser.add_argument('--latency', type=float, default=0, help='平均延迟（毫秒）')
+    parser.add_argument('--jitter', type=float, default=0, help='延迟标准差（毫秒）')
+    parser.add_argument('--error-rate', type=float, default=0, help='错误注入比例 0-1')
+    parser.add_argument('--error-status', type=int, default=500, help='注入错误的状态码（如 429/500）')
+    args = parser.parse_args()
+
+    stub = TavilyStub(args.dir, args.mode, args.latency, args.jitter, args.error_rate, args.error_status)
+    server = serve(stub, args.host, args.port)
+    print(f"🧪 Tavily 替身 ({args.mode}) http://{args.host}:{args.port}/search")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 {json.dumps(stub.stats, ensure_ascii=False)}")
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,14 +5,28 @@ TradeGod 统一新闻抓取器
 
 配置：将 API Key 写入 /home/node/clawd/.env
     TAVILY_API_KEY=your_key_here
+    TAVILY_API_URL=http://127.0.0.1:8765/search   # 可选，指向本地替身 tavily_stub.py
 """
 
 import requests
 import xml.etree.ElementTree as ET
 import os
+import time
 from datetime import datetime
 from typing import List, Dict, Optional
 
+from news_concurrent import DEFAULT_DEADLINE
+from sina_roll import SINA_TTL, WatermarkStore, fetch_sina_page, refresh_sina
+from news_store import NewsStore
+from http_cache import HttpCache
+from news_index import NewsIndex
+from keyword_tagger import get_tagger
+from news_cluster import NewsClusters
+from stock_linker import get_linker
+from news_quotes import AShareQuoteFetcher, attach_quotes
+from tavily_cache import TAVILY_CACHE_DB, TavilyCache, cache_key
+from tavily_monitor import USAGE_DB, TavilyMonitor, TavilyBudget
+
 # 加载环境变量
 ENV_FILE = '/home/node/clawd/.env'
 if os.path.exists(ENV_FILE):
@@ -22,6 +36,9 @@ if os.path.exists(ENV_FILE):
                 key, value = line.strip().split('=', 1)
                 os.environ[key] = value
 
+TAVILY_API_URL = "https://api.tavily.com/search"
+RETAIN_HOURS = 24  # 常驻进程（快讯推送）内存索引/聚类只保留最近N小时
+
 
 class TradeGodNews:
     """TradeGod 统一新闻接口"""
@@ -32,72 +49,95 @@ class TradeGodNews:
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
         })
         self.tavily_key = os.getenv('TAVILY_API_KEY')
+        self.last_timing = {}  # 最近一次并发抓取的各源耗时
+        self.watermarks = WatermarkStore()
+        self.http_cache = HttpCache()
+        self.store = NewsStore()
+        self.index = NewsIndex.from_store(self.store, tagger=get_tagger())
+        self.store.subscribe(self.index.add)
+        self.clusters = NewsClusters.from_store(self.store)
+        self.store.subscribe(self.clusters.add)
+        self.linker = get_linker()
+        self.quote_fetcher = AShareQuoteFetcher(self.session)
+        # TAVILY_API_URL 指向本地替身 (tavily_stub.py) 时，缓存和用量另存一份，不影响真实额度
+        self.tavily_url = os.getenv('TAVILY_API_URL', TAVILY_API_URL)
+        suffix = '' if self.tavily_url == TAVILY_API_URL else '.stub'
+        self.tavily_cache = TavilyCache(TAVILY_CACHE_DB + suffix)
+        self.tavily_monitor = TavilyMonitor(USAGE_DB + suffix)
+        self.budget = TavilyBudget(self.tavily_monitor)
     
     # ==================== A股新闻 (RSS) ====================
     
-    def get_sina_finance(self, limit: int = 20) -> List[Dict]:
+    def get_sina_finance(self, limit: int = 20, page: int = 1) -> List[Dict]:
         """新浪财经-财经新闻 - 最稳定实时"""
-        url = "https://feed.mix.sina.com.cn/api/roll/get"
-        params = {"pageid": "153", "lid": "2516", "num": limit, "page": "1", "encode": "utf-8"}
-        
         try:
-            resp = self.session.get(url, params=params, timeout=10)
-            data = resp.json()
-            results = []
-            for item in data.get('result', {}).get('data', []):
-                ctime = int(item.get('ctime', 0))
-                dt = datetime.fromtimestamp(ctime) if ctime else datetime.now()
-                results.append({
-                    'title': item.get('title', ''),
-                    'summary': item.get('intro', '')[:150],
-                    'url': item.get('wapurl', ''),
-                    'time': dt.strftime('%m-%d %H:%M'),
-                    'full_time': dt.strftime('%Y-%m-%d %H:%M:%S'),
-                    'source': '新浪财经',
-                    'type': 'a_stock'
-                })
-            return results
+            return fetch_sina_page(self.session, '新浪财经', num=limit, page=page, cache=self.http_cache)
         except Exception as e:
             print(f"[错误] 新浪财经: {e}")
             return []
     
-    def get_sina_stock(self, limit: int = 10) -> List[Dict]:
+    def get_sina_stock(self, limit: int = 10, page: int = 1) -> List[Dict]:
         """新浪财经-股票新闻"""
-        url = "https://feed.mix.sina.com.cn/api/roll/get"
-        params = {"pageid": "153", "lid": "2517", "num": limit, "page": "1", "encode": "utf-8"}
-        
         try:
-            resp = self.session.get(url, params=params, timeout=10)
-            data = resp.json()
-            results = []
-            for item in data.get('result', {}).get('data', []):
-                ctime = int(item.get('ctime', 0))
-                dt = datetime.fromtimestamp(ctime) if ctime else datetime.now()
-                results.append({
-                    'title': item.get('title', ''),
-                    'summary': item.get('intro', '')[:150],
-                    'url': item.get('wapurl', ''),
-                    'time': dt.strftime('%m-%d %H:%M'),
-                    'full_time': dt.strftime('%Y-%m-%d %H:%M:%S'),
-                    'source': '新浪股票',
-                    'type': 'a_stock'
-                })
-            return results
+            return fetch_sina_page(self.session, '新浪股票', num=limit, page=page, cache=self.http_cache)
         except Exception as e:
             print(f"[错误] 新浪股票: {e}")
             return []
     
-    def fetch_a_stock(self, limit: int = 20) -> List[Dict]:
-        """获取A股综合新闻"""
-        finance = self.get_sina_finance(limit)
-        stock = self.get_sina_stock(limit // 2)
-        return finance + stock
+    def poll_a_stock(self, page_size: int = 20, deadline: float = DEFAULT_DEADLINE,
+                     ttl: float = SINA_TTL) -> List[Dict]:
+        """
+        增量抓取A股新闻：只返回上次之后新出现的条目
+        各源按 ctime 高水位翻页，遇到已见过的新闻即停，水位持久化到磁盘
+        结果写入新闻库，两个频道重复的新闻只返回一次
+        ttl: HTTP缓存新鲜期，高频轮询时传 0（每次条件请求，无变化时只收到304）
+        """
+        return self._poll(page_size, deadline, ttl)[1]
+    
+    def poll_fetched(self, page_size: int = 20, deadline: float = DEFAULT_DEADLINE,
+                     ttl: float = SINA_TTL) -> List[Dict]:
+        """
+        同 poll_a_stock，但返回越过本进程水位抓到的全部条目（带 'key'），
+        包括其它进程（早晚报、回填等）已先写入新闻库的，供推送判断用
+        """
+        fetched, _ = self._poll(page_size, deadline, ttl)
+        self.clusters.add(fetched)  # 别的进程先入库的条目没经过本进程的订阅回调
+        return fetched
+    
+    def _poll(self, page_size: int, deadline: float, ttl: float):
+        fetched, added, self.last_timing = refresh_sina(self.session, self.watermarks, self.store, page_size,
+                                                        deadline, cache=self.http_cache, ttl=ttl)
+        return fetched, added
+    
+    def evict(self, hours: float = RETAIN_HOURS) -> Dict[str, int]:
+        """淘汰内存索引/聚类中超过N小时的新闻，返回各自淘汰数（常驻进程定期调用）"""
+        before = int(time.time() - hours * 3600)
+        return {'index': self.index.evict(before), 'clusters': self.clusters.evict(before)}
+    
+    def fetch_a_stock(self, limit: int = 20, deadline: float = DEFAULT_DEADLINE) -> List[Dict]:
+        """获取A股综合新闻：先增量刷新新闻库，再从库中读取最新 limit 条（已去重）"""
+        self.poll_a_stock(page_size=max(limit, 20), deadline=deadline)
+        return self.store.recent(limit, news_type='a_stock')
+    
+    def related_news(self, code: str, limit: int = 5, hours: int = 24) -> List[Dict]:
+        """个股相关新闻（代码索引直接查询，不走网络）"""
+        return self.store.news_for_symbol(code, limit, since=int(time.time()) - hours * 3600)
+    
+    def symbol_sentiment(self, codes: List[str] = None, hours: int = 24) -> Dict[str, Dict]:
+        """个股最近N小时的新闻情绪聚合（库内按代码 GROUP BY）"""
+        return self.store.symbol_sentiment(codes, since=int(time.time()) - hours * 3600)
+    
+    def snapshot_quotes(self, items: List[Dict]) -> Dict[str, Dict]:
+        """给一批新闻附上所提股票的实时行情（整批只发一次行情请求）"""
+        return attach_quotes(items, self.quote_fetcher, self.linker)
     
     # ==================== 全球深度搜索 (Tavily) ====================
     
     def search_tavily(self, query: str, max_results: int = 10, 
                       include_answer: bool = True,
-                      search_depth: str = "basic") -> Dict:
+                      search_depth: str = "basic",
+                      query_class: str = "default",
+                      job: str = "adhoc") -> Dict:
         """
         Tavily AI搜索 - 全球深度搜索
         
@@ -106,15 +146,48 @@ class TradeGodNews:
             max_results: 最大结果数 (默认10)
             include_answer: 是否包含AI总结
             search_depth: basic(快) / advanced(深)
+            query_class: 缓存有效期类别 (market/report/company/default)
+            job: 调用方任务 (morning/evening/adhoc)，用于额度预算
+        
+        返回结果带 'from_cache'：True 为缓存命中（不消耗额度），False 为真实请求；
+        'budget' 为本次的预算决策 (search/downgrade/cache)
         """
         if not self.tavily_key:
             return {"error": "TAVILY_API_KEY not configured", "results": []}
         
-        url = "https://api.tavily.com/search"
+        # 一次调用可能查多个缓存键（降级后的 basic、额度不足时的过期结果），命中/未命中只记一次
+        key = cache_key(query, search_depth, max_results, include_answer)
+        cached = self.tavily_cache.get(key, query_class, count=False)
+        if cached is not None:
+            self.tavily_cache.record(hit=True)
+            return dict(cached, from_cache=True)
+        
+        decision = self.budget.decide(search_depth, job=job)
+        if decision['action'] == 'downgrade':
+            # 之前降级过的同一查询已有 basic 结果，不再花额度
+            cached = self.tavily_cache.get(cache_key(query, 'basic', max_results, include_answer), query_class,
+                                           count=False)
+            if cached is not None:
+                self.tavily_cache.record(hit=True)
+                return dict(cached, from_cache=True, budget=decision)
+        if decision['action'] == 'cache':
+            for depth in dict.fromkeys([search_depth, 'basic']):
+                stale = self.tavily_cache.get(cache_key(query, depth, max_results, include_answer),
+                                              stale_ok=True, count=False)
+                if stale is not None:
+                    self.tavily_cache.record(hit=True)
+                    return dict(stale, from_cache=True, budget=decision)
+            self.tavily_cache.record(hit=False)
+            return {"error": f"Tavily额度预算不足: {decision['reason']}", "results": [],
+                    "from_cache": True, "budget": decision}
+        
+        self.tavily_cache.record(hit=False)
+        
+        url = self.tavily_url
         headers = {"Authorization": f"Bearer {self.tavily_key}"}
         data = {
             "query": query,
-            "search_depth": search_depth,
+            "search_depth": decision['depth'],
             "max_results": max_results,
             "include_answer": include_answer
         }
@@ -122,21 +195,27 @@ class TradeGodNews:
         try:
             resp = self.session.post(url, json=data, headers=headers, timeout=30)
             resp.raise_for_status()
-            return resp.json()
+            result = resp.json()
         except Exception as e:
-            return {"error": str(e), "results": []}
+            # 超时、连接失败、4xx/5xx 都不计入用量
+            return {"error": str(e), "results": [], "from_cache": False, "budget": decision}
+        
+        self.tavily_monitor.record_call(f"{job}: {query[:40]}", credits=decision['cost'], job=job)
+        self.tavily_cache.put(cache_key(query, decision['depth'], max_results, include_answer),
+                              query, result)
+        return dict(result, from_cache=False, budget=decision)
     
     def search_us_market(self, query: str = None) -> Dict:
         """美股市场搜索 (给小纳用)"""
         if query is None:
             query = "US stock market today Federal Reserve interest rate"
-        return self.search_tavily(query, max_results=10, search_depth="advanced")
+        return self.search_tavily(query, max_results=10, search_depth="advanced", query_class="market")
     
     def search_crypto(self, query: str = None) -> Dict:
         """加密货币搜索 (给小聪用)"""
         if query is None:
             query = "Bitcoin Ethereum crypto market today"
-        return self.search_tavily(query, max_results=10, search_depth="advanced")
+        return self.search_tavily(query, max_results=10, search_depth="advanced", query_class="market")
     
     def search_company(self, company: str, market: str = "US") -> Dict:
         """个股深度搜索"""
@@ -147,7 +226,7 @@ class TradeGodNews:
         else:
             query = f"{company} A股 分析"
         
-        return self.search_tavily(query, max_results=10, search_depth="advanced")
+        return self.search_tavily(query, max_results=10, search_depth="advanced", query_class="company")
     
     # ==================== 统一搜索接口 ====================
     
@@ -169,14 +248,10 @@ class TradeGodNews:
             'global': {}
         }
         
-        # A股搜索 (RSS)
+        # A股搜索 (新闻库倒排索引)
         if 'a_stock' in sources:
-            a_news = self.fetch_a_stock(30)
-            keyword_lower = keyword.lower()
-            result['a_stock'] = [
-                n for n in a_news 
-                if keyword_lower in (n['title'] + n['summary']).lower()
-            ][:10]
+            self.poll_a_stock()
+            result['a_stock'] = self.index.search(keyword, limit=10)
         
         # 全球搜索 (Tavily)
         if 'global' in sources and self.tavily_key:
@@ -192,24 +267,14 @@ class TradeGodNews:
     
     def monitor_sectors(self, sectors: List[str] = None) -> Dict:
         """
-        监控重点行业新闻
+        监控重点行业新闻（最近24小时，倒排索引查询）
         """
         if sectors is None:
             sectors = ['新能源', '半导体', '银行', '房地产', '医药']
         
-        a_news = self.fetch_a_stock(50)
-        result = {}
-        
-        for sector in sectors:
-            sector_lower = sector.lower()
-            matched = [
-                n for n in a_news 
-                if sector_lower in (n['title'] + n['summary']).lower()
-            ][:5]
-            if matched:
-                result[sector] = matched
-        
-        return result
+        self.poll_a_stock()
+        since = int(time.time()) - 24 * 3600
+        return self.index.search_many(sectors, limit=5, since=since)
     
     def get_market_summary(self) -> Dict:
         """